@@ -1,12 +1,22 @@
-import json
+import chunk_store
 
 def load_chunks(filename='sf_code_chunks.json'):
-    """Load chunks from JSON file"""
-    with open(filename, 'r') as f:
-        return json.load(f)
+    """Load chunks from a JSON array file, JSONL file or columnar store"""
+    return chunk_store.load_chunks(filename)
+
+def filter_columnar_short_chunks(store, max_length):
+    """Return array indices of short chunks, scanning only the character_count column"""
+    return store.filter_rows('character_count', lambda count: count <= max_length)
+
+def open_chunks(filename='sf_code_chunks.json'):
+    """Open chunks as a lazily decoded sequence: memory-mapped views, or a columnar store"""
+    return chunk_store.open_chunks(filename)
 
 def find_by_number(data, chunk_number):
     """Find chunk by its chunk_number field - returns (index, chunk)"""
+    if hasattr(data, 'position'):
+        i = data.position(chunk_number)
+        return (i, data[i]) if i is not None else (None, None)
     for i, chunk in enumerate(data):
         if chunk.get('chunk_number') == chunk_number:
             return i, chunk
@@ -58,9 +68,14 @@ def print_chunk_row(chunk, print_header=False):
 
 def find_all_short_chunks(filename, max_length):
     """Find and print all chunks shorter than max_length characters in table format"""
-    data = load_chunks(filename)
-    
-    short_chunks = [chunk for chunk in data if chunk['character_count'] <= max_length]
+    if chunk_store.is_columnar(filename):
+        store = chunk_store.ColumnarChunkStore(filename)
+        fields = ['chunk_number', 'chapter', 'article', 'section_id', 'chunk_index',
+                  'character_count', 'content', 'html_tags']
+        short_chunks = [store.chunk(i, fields) for i in filter_columnar_short_chunks(store, max_length)]
+    else:
+        data = open_chunks(filename)
+        short_chunks = [chunk for chunk in data if chunk['character_count'] <= max_length]
     
     print(f"Found {len(short_chunks)} chunks with <= {max_length} characters:")
     
@@ -71,20 +86,34 @@ def find_all_short_chunks(filename, max_length):
 
 def find_short_chunks(filename, max_length):
     """Find and return all chunks shorter than max_length characters with their indices"""
-    data = load_chunks(filename)
-    
     short_chunks = []
-    for i, chunk in enumerate(data):
-        if chunk['character_count'] <= max_length:
+    if chunk_store.is_columnar(filename):
+        # Filter on the character_count column; decode other fields only for matching rows
+        store = chunk_store.ColumnarChunkStore(filename)
+        counts = store.int_column('character_count')
+        for i in filter_columnar_short_chunks(store, max_length):
             short_chunks.append({
                 'array_index': i,
-                'chunk_number': chunk.get('chunk_number'),
-                'character_count': chunk['character_count'],
-                'content': chunk['content'],
-                'section_id': chunk.get('section_id'),
-                'title': chunk.get('title'),
-                'predecessor_length': data[i-1]['character_count'] if i > 0 else None
+                'chunk_number': store.value('chunk_number', i),
+                'character_count': counts[i],
+                'content': store.value('content', i),
+                'section_id': store.value('section_id', i),
+                'title': store.value('title', i),
+                'predecessor_length': counts[i-1] if i > 0 else None
             })
+    else:
+        data = open_chunks(filename)
+        for i, chunk in enumerate(data):
+            if chunk['character_count'] <= max_length:
+                short_chunks.append({
+                    'array_index': i,
+                    'chunk_number': chunk.get('chunk_number'),
+                    'character_count': chunk['character_count'],
+                    'content': chunk['content'],
+                    'section_id': chunk.get('section_id'),
+                    'title': chunk.get('title'),
+                    'predecessor_length': data[i-1]['character_count'] if i > 0 else None
+                })
     
     print(f"Found {len(short_chunks)} chunks with <= {max_length} characters:")
     print("-" * 80)
@@ -102,7 +131,11 @@ def find_short_chunks(filename, max_length):
 
 def print_chunk_details(filename, chunk_numbers):
     """Print full details for specific chunk numbers"""
-    data = load_chunks(filename)
+    data = open_chunks(filename)
+    if hasattr(data, 'position'):
+        # Decode only the requested chunks, still printed in file order
+        positions = sorted(p for p in (data.position(n) for n in set(chunk_numbers)) if p is not None)
+        data = [data[p] for p in positions]
     
     for chunk in data:
         chunk_num = chunk.get('chunk_number')
@@ -118,7 +151,7 @@ def main():
     
     parser = argparse.ArgumentParser(description='Analyze SF code chunks')
     parser.add_argument('-f', '--file', default='sf_code_chunks.json', 
-                       help='JSON file to analyze (default: sf_code_chunks.json)')
+                       help='JSON/JSONL file or columnar store directory to analyze (default: sf_code_chunks.json)')
     parser.add_argument('-s', '--short', type=int, metavar='N',
                        help='Find chunks shorter than N characters')
     parser.add_argument('-n', '--number', type=int, metavar='NUM',
@@ -147,7 +180,7 @@ def main():
 
 def analyze_chunk_with_neighbors(filename, chunk_number):
     """Analyze a chunk along with its predecessor and successor"""
-    data = load_chunks(filename)
+    data = open_chunks(filename)
     
     array_index, target_chunk = find_by_number(data, chunk_number)
     
@@ -183,7 +216,7 @@ def analyze_chunk_with_neighbors(filename, chunk_number):
 
 def analyze_neighbors(filename, chunk_number, radius):
     """Print info for chunks around target: K-radius, ..., K-1, K, K+1, ..., K+radius"""
-    data = load_chunks(filename)
+    data = open_chunks(filename)
     
     array_index, target_chunk = find_by_number(data, chunk_number)
     
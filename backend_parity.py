@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compare SFCodeParser chunk output across tree builder backends.
+
+The html.parser full-tree parse is the baseline; every other backend (and, optionally,
+streaming mode) is diffed field by field against it.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from parse_sf_code import CONFIG, SFCodeParser, builtin_doc_uuid
+
+# Fields that legitimately differ between runs
+DEFAULT_IGNORE_FIELDS = ['processing_timestamp']
+
+# Fields a backend cannot reproduce: bs4 only records sourceline for html.parser
+BACKEND_IGNORE_FIELDS = {
+    'lxml': ['html_tags.line_number']
+}
+
+
+def run_parser(html_file, backend, streaming=False, max_chunk_size=CONFIG['max_chunk_size']):
+    """Parse html_file with one backend and return (chunks, elapsed seconds)."""
+    # uuids only have to agree between runs here, so the helpers checkout is not needed
+    parser = SFCodeParser(html_file, max_chunk_size=max_chunk_size, streaming=streaming, backend=backend,
+                          doc_uuid_function=builtin_doc_uuid)
+    start = time.time()
+    # The parser prints its statistics on stdout; keep the parity report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = parser.parse()
+    return chunks, time.time() - start
+
+
+def strip_ignored_subfields(field, value, ignore_fields):
+    """Drop ignored sub-fields (e.g. 'html_tags.line_number') from a list of dicts."""
+    subfields = {name.split('.', 1)[1] for name in ignore_fields if name.startswith(field + '.')}
+    if not subfields or not isinstance(value, list):
+        return value
+    return [{k: v for k, v in item.items() if k not in subfields} if isinstance(item, dict) else item
+            for item in value]
+
+
+def compare_chunks(baseline, candidate, ignore_fields):
+    """Diff two chunk lists position by position.
+
+    ignore_fields may name whole fields ('processing_timestamp') or sub-fields of
+    list-of-dict fields ('html_tags.line_number').
+    Returns a dict of field -> {'count': mismatching chunks, 'first': example}.
+    """
+    mismatches = {}
+    if len(baseline) != len(candidate):
+        mismatches['chunk_count'] = {
+            'count': abs(len(baseline) - len(candidate)),
+            'first': {'baseline': len(baseline), 'candidate': len(candidate)}
+        }
+
+    for base_chunk, cand_chunk in zip(baseline, candidate):
+        for field in sorted(set(base_chunk) | set(cand_chunk)):
+            if field in ignore_fields:
+                continue
+            base_value = strip_ignored_subfields(field, base_chunk.get(field), ignore_fields)
+            cand_value = strip_ignored_subfields(field, cand_chunk.get(field), ignore_fields)
+            if base_value != cand_value:
+                entry = mismatches.setdefault(field, {'count': 0, 'first': None})
+                entry['count'] += 1
+                if entry['first'] is None:
+                    entry['first'] = {
+                        'chunk_number': base_chunk.get('chunk_number'),
+                        'baseline': base_value,
+                        'candidate': cand_value
+                    }
+    return mismatches
+
+
+def print_report(label, elapsed, baseline_elapsed, mismatches):
+    """Print the parity result for one backend."""
+    speedup = baseline_elapsed / elapsed if elapsed else 0
+    print(f"\n{label}: {elapsed:.1f}s ({speedup:.2f}x vs baseline)")
+    if not mismatches:
+        print("  IDENTICAL to baseline")
+        return
+
+    for field, entry in sorted(mismatches.items()):
+        print(f"  {field}: {entry['count']} chunks differ")
+        first = entry['first']
+        print(f"    first: {repr(first)[:300]}")
+
+
+def main():
+    parser_args = argparse.ArgumentParser(description='Diff SFCodeParser output of each backend against html.parser')
+    parser_args.add_argument('-i', '--input', default=CONFIG['input_file'],
+                            help=f"Input HTML file (default: {CONFIG['input_file']})")
+    parser_args.add_argument('-b', '--backends', nargs='+', default=['lxml'],
+                            help="Backends to compare against html.parser (default: lxml)")
+    parser_args.add_argument('--stream', action='store_true',
+                            help="Also compare streaming mode for every backend, including html.parser")
+    parser_args.add_argument('--ignore', nargs='*', default=DEFAULT_IGNORE_FIELDS,
+                            help=f"Chunk fields to leave out of the comparison (default: {DEFAULT_IGNORE_FIELDS})")
+    parser_args.add_argument('--strict', action='store_true',
+                            help="Also compare fields a backend is known not to reproduce (e.g. html_tags.line_number)")
+    args = parser_args.parse_args()
+
+    print(f"Baseline: html.parser on {args.input}")
+    baseline, baseline_elapsed = run_parser(args.input, 'html.parser')
+    print(f"  {len(baseline)} chunks in {baseline_elapsed:.1f}s")
+
+    runs = [(backend, False) for backend in args.backends]
+    if args.stream:
+        runs += [(backend, True) for backend in ['html.parser'] + args.backends]
+
+    all_identical = True
+    for backend, streaming in runs:
+        label = f"{backend} (streaming)" if streaming else backend
+        try:
+            chunks, elapsed = run_parser(args.input, backend, streaming=streaming)
+        except Exception as e:
+            print(f"\n{label}: FAILED - {e}")
+            all_identical = False
+            continue
+        ignore_fields = set(args.ignore)
+        if not args.strict:
+            ignore_fields.update(BACKEND_IGNORE_FIELDS.get(backend, []))
+        mismatches = compare_chunks(baseline, chunks, ignore_fields)
+        print_report(label, elapsed, baseline_elapsed, mismatches)
+        all_identical = all_identical and not mismatches
+
+    sys.exit(0 if all_identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Generate deterministic amlegal-shaped SF Municipal Code HTML for benchmarks.
+
+The output has the structure parse_sf_code.py expects from the real export: Chapter,
+Article, Division, Section and Subsection rbox headers, Normal-Level rbox paragraphs
+(some behind AnnotationDrawer blocks, some with nested rboxes and EdNotes), History
+divs, Link / a.Web / intercodelink / img elements, long fee tables, footnote tables
+and year ordinance headers. The same size and seed always give the same bytes.
+
+Optionally a matching unstructured text rendition is written as well, with a few
+paragraphs dropped or altered, for diff_analyzer.py to compare against.
+"""
+
+import argparse
+import random
+import re
+
+WORDS = ("the city shall any person permit department fee section board code "
+         "ordinance provided that rental residential short-term unit owner "
+         "notice hearing planning commission zoning use public health").split()
+ROMAN_NUMERALS = [(1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+                  (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I')]
+SIZE_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\s*([KMG]?B?)$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+RAW_ALTERATION_RATE = 0.02  # Share of paragraphs dropped or altered in the raw text rendition
+GENERATOR_VERSION = 2  # Bump when the output for a size and seed changes, so cached inputs are regenerated
+
+
+def parse_size(text):
+    """Parse a size such as '1MB', '500MB' or '1.5GB' into bytes."""
+    match = SIZE_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid size '{text}' (use e.g. 1MB, 500MB, 2GB)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def roman(number):
+    """Roman numeral for number (article numbers are unique across the whole document)."""
+    parts = []
+    for value, numeral in ROMAN_NUMERALS:
+        count, number = divmod(number, value)
+        parts.append(numeral * count)
+    return ''.join(parts)
+
+
+class CodeGenerator:
+    """Writes one chapter block at a time, so memory use does not grow with the size."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        # The raw text rendition draws from its own generator, so asking for it does not
+        # change the HTML generated for a size and seed
+        self.raw_rng = random.Random(f'{seed}:raw-text')
+        self.record_ids = {}  # section -> stable record id used in its Link pathnames
+        self.sections = []  # every section written so far, targets for Link elements
+        self.article_count = 0
+
+    def sentence(self, words=None, rng=None):
+        rng = rng or self.rng
+        words = words or rng.randint(6, 40)
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    def annotation(self):
+        return '<div><annotationdrawer><span>Annotate</span> note &amp; tools</annotationdrawer></div>'
+
+    def ordinance(self):
+        return f'{self.rng.randint(1, 300)}-{self.rng.randint(0, 24):02d}'
+
+    def link(self, section):
+        record_id = self.record_ids.setdefault(section, len(self.record_ids) + 1)
+        return (f'<link to="{{pathname: \'/codes/san_francisco/0-0-0-{record_id}\', '
+                f'hash: \'#JD_{section}\'}}">Section {section}</link>')
+
+    def paragraph(self):
+        """Return (html, text) of one Normal-Level paragraph's inline content."""
+        rng = self.rng
+        first, second = self.sentence(), self.sentence()
+        html_bits, text_bits = [first], [first]
+        r = rng.random()
+        if r < 0.3 and self.sections:
+            section = rng.choice(self.sections[-200:]) if rng.random() < 0.8 else rng.choice(self.sections)
+            html_bits.append(self.link(section))
+            text_bits.append(f'Section {section}')
+        elif r < 0.4:
+            ordinance = self.ordinance()
+            href = f'https://sfgov.legistar.com/{rng.randint(1, 999)}.pdf'
+            html_bits.append(f'<a class="Web" href="{href}">Ord. {ordinance}</a>')
+            text_bits.append(f'Ord. {ordinance}')
+        elif r < 0.45:
+            code_section = rng.randint(100, 999)
+            html_bits.append(f'<intercodelink destinationid="0-0-0-{rng.randint(1, 9999)}">'
+                             f'Planning Code Sec. {code_section}</intercodelink>')
+            text_bits.append(f'Planning Code Sec. {code_section}')
+        elif r < 0.48:
+            html_bits.append(f'<img src="/images/fig{rng.randint(1, 99)}.png" alt="Figure" width="100" height="50"/>')
+        html_bits.append(second)
+        text_bits.append(second)
+        if rng.random() < 0.2:
+            marker = rng.randint(1, 9)
+            html_bits.append(f'<span class="footnote"><sup>{marker}</sup></span>')
+        return ' '.join(html_bits), ' '.join(text_bits)
+
+    def chapter(self, number):
+        """Return (html, raw text lines) of one chapter."""
+        rng = self.rng
+        html = []
+        text = []
+
+        title = self.sentence(4).upper()
+        html.append(f'<div class="rbox Chapter" id="JD_Chapter{number}">{self.annotation()}'
+                    f'<div class="Chapter toc-destination rbox-content"><a name="JD_Chapter{number}"></a>'
+                    f'CHAPTER {number}: {title}</div></div>\n')
+        text.append(f'CHAPTER {number}: {title}')
+
+        for _ in range(rng.randint(1, 4)):
+            self.article_count += 1
+            article = roman(self.article_count)
+            title = self.sentence(5).upper()
+            html.append(f'<div class="rbox Article" id="JD_Article{article}">{self.annotation()}'
+                        f'<div class="Article"><a name="JD_Article{article}"></a>ARTICLE {article}: {title}</div></div>\n')
+            text.append(f'ARTICLE {article}: {title}')
+            if rng.random() < 0.3:
+                division = f'Division {rng.randint(1, 9)}. {self.sentence(3)}'
+                html.append(f'<div class="rbox Division"><div class="Division">{division}</div></div>\n')
+                text.append(division)
+
+            for s in range(rng.randint(2, 10)):
+                section = f'{number}.{self.article_count}{s:02d}'
+                self.sections.append(section)
+                title = self.sentence(4).upper()
+                html.append(f'<div class="rbox Section" id="JD_{section}">{self.annotation()}'
+                            f'<div class="Section toc-destination rbox-content"><a name="JD_{section}"></a>'
+                            f'SEC. {section}. {title}</div></div>\n')
+                text.append(f'SEC. {section}. {title}')
+                self.section_body(section, html, text)
+
+        if rng.random() < 0.1:
+            html.append(f'<div class="rbox level-Year"><div class="Year">{2000 + number % 24} ORDINANCES</div></div>\n')
+            text.append(f'{2000 + number % 24} ORDINANCES')
+        return ''.join(html), text
+
+    def section_body(self, section, html, text):
+        rng = self.rng
+        for p in range(rng.randint(1, 8)):
+            style = rng.choice(['Normal', 'Normal', 'Normal', 'List1', 'List2', 'NewOrd'])
+            element_id = f' id="JD_{section}_{p}"' if rng.random() < 0.7 else ''
+            inner, inner_text = self.paragraph()
+            extra = ''
+            if rng.random() < 0.1:
+                nested, note = self.sentence(), self.sentence()
+                extra = (f'<div class="rbox Normal-Level nested"><div class="Normal">Nested {nested}'
+                         f'<div class="EdNote">Editor\'s Note: {note}</div>'
+                         f'<img src="/images/n{p}.png"/></div></div>')
+                inner_text += f" Editor's Note: {note}"
+            if rng.random() < 0.05:
+                extra += '<!-- comment inside -->'
+            annotation = self.annotation() if rng.random() < 0.5 and style != 'NewOrd' else ''
+            html.append(f'<div class="rbox Normal-Level"{element_id}>{annotation}'
+                        f'<div class="{style}">{inner}{extra}</div></div>\n')
+            text.append(inner_text)
+
+            if rng.random() < 0.05:
+                # Long fee schedules are what make some sections very large
+                rows = []
+                row_text = []
+                for k in range(rng.randint(5, 60)):
+                    fee = f'${rng.randint(1, 999)}.00'
+                    rows.append(f'<tr><td>Fee {k}</td><td>{fee}</td></tr>')
+                    row_text.append(f'Fee {k} {fee}')
+                html.append(f'<div class="rbox Normal-Level"><div class="Normal"><table>{"".join(rows)}'
+                            f'</table></div></div>\n')
+                text.append(' '.join(row_text))
+
+        added, amended = self.ordinance(), self.ordinance()
+        history = f'(Added by Ord. {added}, File No. 1; amended by Ord. {amended}, Ord. 5-19; see Ord. 9-20)'
+        html.append(f'<div class="rbox Normal-Level"><div class="History">{history}</div></div>\n')
+        text.append(history)
+        if rng.random() < 0.1:
+            footnote = self.sentence()
+            html.append(f'<table class="footnote"><tr><td class="marker">*</td>'
+                        f'<td class="foot-text">{footnote}</td></tr></table>\n')
+            text.append(f'* {footnote}')
+        if rng.random() < 0.03:
+            subsection = f'({rng.randint(1, 9)}) {self.sentence(3)}'
+            html.append(f'<div class="rbox Subsection"><div class="Subsection">{subsection}</div></div>\n')
+            text.append(subsection)
+
+    def raw_lines(self, lines):
+        """Raw text rendition of lines, with a few paragraphs dropped or altered."""
+        rng = self.raw_rng
+        for line in lines:
+            r = rng.random()
+            if r < RAW_ALTERATION_RATE / 2:
+                continue
+            if r < RAW_ALTERATION_RATE:
+                line = f'{line} {self.sentence(rng=rng)}'
+            yield line
+
+
+def write_html(html_file, target_bytes, seed=0, raw_text_file=None):
+    """Write chapters to html_file until it holds at least target_bytes; return the chapter count."""
+    generator = CodeGenerator(seed)
+    html_file.write('<!DOCTYPE html>\n<html><head><title>San Francisco Municipal Code</title></head><body>\n')
+    written = 0
+    chapters = 0
+    while written < target_bytes:
+        chapters += 1
+        block, lines = generator.chapter(chapters)
+        html_file.write(block)
+        written += len(block.encode('utf-8'))
+        if raw_text_file:
+            raw_text_file.write('\n'.join(generator.raw_lines(lines)) + '\n')
+    html_file.write('</body></html>\n')
+    return chapters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic SF-code-shaped HTML for benchmarks')
+    parser.add_argument('output', help='Output HTML file')
+    parser.add_argument('-s', '--size', default='1MB', help='Approximate output size, e.g. 1MB, 100MB, 500MB (default: 1MB)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--raw-text', metavar='FILE',
+                        help='Also write the matching unstructured text (input for diff_analyzer.py)')
+    args = parser.parse_args()
+
+    with open(args.output, 'w', encoding='utf-8') as html_file:
+        if args.raw_text:
+            with open(args.raw_text, 'w', encoding='utf-8') as raw_text_file:
+                chapters = write_html(html_file, parse_size(args.size), args.seed, raw_text_file)
+        else:
+            chapters = write_html(html_file, parse_size(args.size), args.seed)
+    print(f"Wrote {chapters} chapters to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SF code pipeline on generated HTML.
+
+For each size, generate_html.py writes a deterministic input (reused on later runs
+from the work directory), then each case runs in a fresh process so its peak RSS is
+its own:
+- parse:          SFCodeParser.parse, then save_to_json (reported as two rows)
+- analyze:        analyze_chunks chunk_number lookups with neighbors, and a short-chunk scan
+- diff:           diff_analyzer.py end to end against the generated raw text
+
+Every row reports seconds, items/sec, MB/sec and peak RSS.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from generate_html import GENERATOR_VERSION, parse_size, write_html
+
+CASES = ('parse', 'analyze', 'diff')
+RAW_TEXT_PATH = os.path.join('rawcodes', 'san_francisco-ca-unstructuredtext.txt')  # Where diff_analyzer.py reads it
+LOOKUPS = 1000  # Random chunk_number lookups in the analyze case
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children, in MB."""
+    import resource
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measurement(case, seconds, items, item_name, data_bytes):
+    return {
+        'case': case,
+        'seconds': round(seconds, 4),
+        'items': items,
+        'item_name': item_name,
+        'items_per_sec': round(items / seconds, 1) if seconds else None,
+        'mb_per_sec': round(data_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def prepare_inputs(work_dir, size, seed):
+    """Generate (or reuse) the HTML and raw text for one size; return the run directory."""
+    run_dir = os.path.join(work_dir, f'{size}_seed{seed}_v{GENERATOR_VERSION}')
+    html_path = os.path.join(run_dir, 'input.html')
+    if not os.path.exists(html_path):
+        os.makedirs(os.path.join(run_dir, 'rawcodes'), exist_ok=True)
+        start = time.perf_counter()
+        # Written under temporary names, so an interrupted run is not reused
+        with open(html_path + '.tmp', 'w', encoding='utf-8') as html_file, \
+                open(os.path.join(run_dir, RAW_TEXT_PATH), 'w', encoding='utf-8') as raw_text_file:
+            write_html(html_file, parse_size(size), seed, raw_text_file)
+        os.replace(html_path + '.tmp', html_path)
+        print(f"Generated {size} input in {time.perf_counter() - start:.1f}s: {html_path}")
+    return run_dir
+
+
+def run_parse(run_dir, options):
+    from parse_sf_code import SFCodeParser, builtin_doc_uuid
+    html_path = os.path.join(run_dir, 'input.html')
+    parser = SFCodeParser(html_path, streaming=options['stream'], workers=options['workers'],
+                          backend=options['backend'], progress='quiet', doc_uuid_function=builtin_doc_uuid)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        parser.parse()
+        parse_seconds = time.perf_counter() - start
+    results = [measurement('parse', parse_seconds, parser.stats['total_elements_processed'], 'elements',
+                           os.path.getsize(html_path))]
+    results[0]['stages'] = {name: round(stage['seconds'], 4) for name, stage in parser.stats['stages'].items()}
+
+    chunks_path = os.path.join(run_dir, 'chunks.json')
+    start = time.perf_counter()
+    parser.save_to_json(chunks_path)
+    results.append(measurement('save_to_json', time.perf_counter() - start, len(parser.chunks), 'chunks',
+                               os.path.getsize(chunks_path)))
+    return results
+
+
+def run_analyze(run_dir, options):
+    import analyze_chunks
+    chunks_path = os.path.join(run_dir, 'chunks.json')
+    data = analyze_chunks.open_chunks(chunks_path)
+    chunk_numbers = [data[i]['chunk_number'] for i in range(len(data))]
+    targets = random.Random(options['seed']).choices(chunk_numbers, k=LOOKUPS)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for chunk_number in targets:
+            analyze_chunks.analyze_neighbors(chunks_path, chunk_number, 2)
+        lookup_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyze_chunks.find_short_chunks(chunks_path, 50)
+        scan_seconds = time.perf_counter() - start
+    return [measurement('analyze_lookup', lookup_seconds, LOOKUPS, 'lookups', 0),
+            measurement('analyze_scan', scan_seconds, len(chunk_numbers), 'chunks', os.path.getsize(chunks_path))]
+
+
+def run_diff(run_dir, options):
+    import diff_analyzer
+    raw_text_path = os.path.join(run_dir, RAW_TEXT_PATH)
+    with open(raw_text_path, 'r', encoding='utf-8') as f:
+        articles = len(diff_analyzer.find_article_divisions(f.read()))
+
+    # diff_analyzer.py reads the raw text and writes reconstructed_raw.txt relative to the working directory
+    os.chdir(run_dir)
+    sys.argv = ['diff_analyzer.py', 'chunks.json', '--mode', options['diff_mode'], '--jobs', str(options['jobs'])]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        diff_analyzer.main()
+        seconds = time.perf_counter() - start
+    return [measurement('diff', seconds, articles, 'articles', os.path.getsize(raw_text_path))]
+
+
+CASE_RUNNERS = {'parse': run_parse, 'analyze': run_analyze, 'diff': run_diff}
+
+
+def run_case_process(case, run_dir, options, results):
+    # Parsing writes unhandled_text.json to the working directory; keep it with the run
+    os.chdir(run_dir)
+    results.put(CASE_RUNNERS[case](run_dir, options))
+
+
+def run_case(case, run_dir, options):
+    """Run one case in a fresh process and return its measurements."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_case_process, args=(case, run_dir, options, results))
+    process.start()
+    while True:
+        try:
+            measurements = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"{case} benchmark failed in {run_dir} (exit code {process.exitcode})")
+    process.join()
+    return measurements
+
+
+def print_row(size, result):
+    items = f"{result['items']} {result['item_name']}"
+    rate = f"{result['items_per_sec']:.0f}/s" if result['items_per_sec'] is not None else '-'
+    mb_rate = f"{result['mb_per_sec']:.2f}" if result['mb_per_sec'] else '-'
+    print(f"{size:<8} {result['case']:<15} {result['seconds']:>9.3f} {items:>18} {rate:>12} {mb_rate:>8} "
+          f"{result['peak_rss_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing, saving, analysis and diffing on generated HTML')
+    parser.add_argument('--sizes', nargs='+', default=['1MB', '10MB'],
+                        help='Input sizes to generate and benchmark, e.g. 1MB 100MB 500MB (default: 1MB 10MB)')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES),
+                        help='Cases to run; analyze and diff use the chunks written by parse (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Generator seed (default: 0)')
+    parser.add_argument('--work-dir', default=os.path.join(BENCHMARK_DIR, 'work'),
+                        help='Where generated inputs and outputs are kept between runs (default: benchmarks/work)')
+    parser.add_argument('--stream', action='store_true', help='Parse in streaming mode')
+    parser.add_argument('--workers', type=int, default=1, help='Parser worker processes (default: 1)')
+    parser.add_argument('--backend', default='html.parser', help='BeautifulSoup tree builder (default: html.parser)')
+    parser.add_argument('--diff-mode', default='token', choices=['char', 'token'],
+                        help='diff_analyzer.py --mode (default: token)')
+    parser.add_argument('--jobs', type=int, default=1, help='diff_analyzer.py --jobs (default: 1)')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results as JSON to FILE')
+    args = parser.parse_args()
+
+    options = {
+        'seed': args.seed,
+        'stream': args.stream,
+        'workers': args.workers,
+        'backend': args.backend,
+        'diff_mode': args.diff_mode,
+        'jobs': args.jobs
+    }
+    work_dir = os.path.abspath(args.work_dir)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options,
+        'results': []
+    }
+
+    for size in args.sizes:
+        run_dir = prepare_inputs(work_dir, size, args.seed)
+        if 'parse' not in args.cases and not os.path.exists(os.path.join(run_dir, 'chunks.json')):
+            parser.error(f"{run_dir} has no chunks.json yet; include the parse case")
+        print(f"\n{'Size':<8} {'Case':<15} {'Seconds':>9} {'Items':>18} {'Items/sec':>12} {'MB/sec':>8} {'Peak RSS':>9}")
+        for case in CASES:
+            if case not in args.cases:
+                continue
+            for result in run_case(case, run_dir, options):
+                print_row(size, result)
+                report['results'].append({'size': size, 'input_bytes': os.path.getsize(os.path.join(run_dir, 'input.html')),
+                                          **result})
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
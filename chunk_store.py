@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+Read and write SF code chunk files.
+
+Two file formats are supported:
+- json:  the original indented JSON array (compatibility format)
+- jsonl: one chunk per line (newline-delimited JSON), written as chunks are produced
+
+The writers also produce a sidecar offset index (<output>.idx) mapping each chunk to
+its byte span, so a single chunk can be decoded without parsing the whole file.
+
+A columnar store directory (ColumnarChunkWriter / ColumnarChunkStore) keeps scalar
+fields as separate columns so filters only read the columns they test.
+
+Chunks split with overlap keep only their own text in 'content'; the repeated text is an
+'overlap' [start, end] range into the previous chunk's content, which resolve_content()
+and iter_resolved_content() prepend when reading. Likewise, chunks parsed with a
+reference table list 'reference_ids' into it; resolve_references() looks them up.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from collections.abc import Mapping
+
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+def format_for_path(path):
+    """Pick the output format from a file name: 'jsonl' for .jsonl/.ndjson, else 'json'."""
+    return 'jsonl' if str(path).lower().endswith(JSONL_EXTENSIONS) else 'json'
+
+
+def detect_format(path):
+    """Detect a chunk file's format from its first non-whitespace character."""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            char = f.read(1)
+            if not char:
+                return 'jsonl'  # Empty file: no chunks either way
+            if not char.isspace():
+                return 'json' if char == '[' else 'jsonl'
+
+
+def iter_chunks(path):
+    """Yield chunks from a JSON array file, JSONL file or columnar store."""
+    if is_columnar(path):
+        yield from ColumnarChunkStore(path)
+        return
+
+    if detect_format(path) == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_chunks(path):
+    """Load all chunks from a JSON array file, JSONL file or columnar store."""
+    return list(iter_chunks(path))
+
+
+# Offset index layout: header (magic, chunk count, size and mtime_ns of the indexed
+# file), then N int64 chunk_numbers, N int64 byte offsets and N int64 byte lengths in
+# array order. Everything is in native byte order, like the array('q') values; an index
+# copied from a machine of the other byte order fails the size check and is ignored.
+INDEX_MAGIC = b'SFCIDX02'
+INDEX_HEADER = struct.Struct('=8sqqq')
+
+
+def index_path_for(path):
+    """Sidecar offset index path for a chunk file."""
+    return f'{path}.idx'
+
+
+def write_index(path, chunk_numbers, offsets, lengths):
+    """Write the sidecar offset index for an already written chunk file."""
+    stat = os.stat(path)
+    with open(index_path_for(path), 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(chunk_numbers), stat.st_size, stat.st_mtime_ns))
+        for values in (chunk_numbers, offsets, lengths):
+            array('q', values).tofile(f)
+
+
+class ChunkFileWriter:
+    """Base for writers that stream chunks to a single file and index their byte spans."""
+
+    def __init__(self, path, index=True):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.index = index
+        self.position = 0  # Bytes written so far
+        self.chunk_numbers = array('q')
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self.count = 0
+
+    def _write_bytes(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def _write_chunk_bytes(self, chunk, data):
+        self.chunk_numbers.append(chunk.get('chunk_number') or 0)
+        self.offsets.append(self.position)
+        self.lengths.append(len(data))
+        self._write_bytes(data)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        if self.index:
+            write_index(self.path, self.chunk_numbers, self.offsets, self.lengths)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonlChunkWriter(ChunkFileWriter):
+    """Write chunks to a JSONL file one line at a time, as they are produced."""
+
+    def write(self, chunk):
+        self._write_chunk_bytes(chunk, json.dumps(chunk, ensure_ascii=False).encode('utf-8'))
+        self._write_bytes(b'\n')
+
+
+class JsonArrayChunkWriter(ChunkFileWriter):
+    """Write chunks as an indented JSON array, byte-identical to json.dump(chunks, f, indent=2)."""
+
+    def __init__(self, path, index=True):
+        super().__init__(path, index)
+        self._write_bytes(b'[')
+
+    def write(self, chunk):
+        self._write_bytes(b'\n  ' if self.count == 0 else b',\n  ')
+        # Strings never contain raw newlines in JSON, so re-indenting every line is safe
+        text = json.dumps(chunk, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        self._write_chunk_bytes(chunk, text.encode('utf-8'))
+
+    def close(self):
+        self._write_bytes(b'\n]' if self.count else b']')
+        super().close()
+
+
+# Chunk boundaries in the parser's json.dump(indent=2) layout: each chunk opens on a
+# line that is exactly '  {' and closes on a line starting with '  }'
+JSON_CHUNK_START_PATTERN = re.compile(rb'^  \{\r?$', re.MULTILINE)
+JSON_CHUNK_END_PATTERN = re.compile(rb'^  \}', re.MULTILINE)
+JSONL_LINE_PATTERN = re.compile(rb'[^\r\n]+')
+
+# Top-level keys of a chunk in the indented layout: json.dump(indent=2) puts every
+# top-level key of a chunk at the start of a line indented exactly 4 spaces (nested
+# keys are indented further, and JSON strings never contain raw newlines)
+INDENTED_KEY_PATTERN = re.compile(rb'\n    ("(?:[^"\\]|\\.)*"): ')
+JSON_SCANNER = json.scanner.make_scanner(json.JSONDecoder())
+JSON_WHITESPACE = json.decoder.WHITESPACE
+decoded_keys = {}  # Encoded key -> key; chunks share a small set of field names
+
+
+def map_file(path):
+    """Memory-map a file read-only (mmap cannot map an empty file, so that maps to b'')."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def scan_chunk_spans(data, file_format):
+    """Find the (offsets, lengths) byte spans of every chunk in a mapped chunk file."""
+    offsets, lengths = array('q'), array('q')
+    if file_format == 'json':
+        ends = JSON_CHUNK_END_PATTERN.finditer(data)
+        for start_match in JSON_CHUNK_START_PATTERN.finditer(data):
+            start = start_match.start() + 2
+            for end_match in ends:
+                if end_match.start() > start:
+                    offsets.append(start)
+                    lengths.append(end_match.end() - start)
+                    break
+    else:
+        for match in JSONL_LINE_PATTERN.finditer(data):
+            if match.group().strip():
+                offsets.append(match.start())
+                lengths.append(match.end() - match.start())
+    return offsets, lengths
+
+
+def build_index(path):
+    """Build the sidecar offset index for an existing JSON array or JSONL chunk file.
+
+    JSON arrays must be in the json.dump(indent=2) layout the parser writes.
+    Returns the number of chunks indexed.
+    """
+    data = map_file(path)
+    offsets, lengths = scan_chunk_spans(data, detect_format(path))
+    chunk_numbers = array('q', (ChunkView(data, offset, offset + length).get('chunk_number') or 0
+                                for offset, length in zip(offsets, lengths)))
+    write_index(path, chunk_numbers, offsets, lengths)
+    return len(offsets)
+
+
+class ChunkView(Mapping):
+    """Read-only mapping over one encoded chunk that decodes a field only when accessed.
+
+    The first access finds the chunk's top-level key/value spans; each value is
+    json-decoded on first use and cached.
+    """
+
+    __slots__ = ('_data', '_start', '_end', '_spans', '_values')
+
+    def __init__(self, data, start, end):
+        self._data = data
+        self._start = start
+        self._end = end
+        self._spans = None
+        self._values = {}
+
+    def _key_spans(self):
+        if self._spans is None:
+            if self._data[self._start + 1:self._start + 2] == b'\n':
+                self._spans = self._indented_key_spans()
+            else:
+                self._spans = self._compact_key_spans()
+        return self._spans
+
+    def _indented_key_spans(self):
+        """Key spans found with one regex pass; values are never looked at."""
+        spans = {}
+        previous = None
+        for match in INDENTED_KEY_PATTERN.finditer(self._data, self._start, self._end):
+            if previous is not None:
+                spans[previous[0]] = (previous[1], match.start() - 1)  # Drop the ',' separator
+            encoded_key = match.group(1)
+            key = decoded_keys.get(encoded_key)
+            if key is None:
+                key = decoded_keys[encoded_key] = json.loads(encoded_key)
+            previous = (key, match.end())
+        if previous is not None:
+            spans[previous[0]] = (previous[1], self._data.rfind(b'\n', self._start, self._end))
+        return spans
+
+    def _compact_key_spans(self):
+        """Key spans of a single-line chunk, skipping values with json's C scanner."""
+        text = self._data[self._start:self._end].decode('utf-8')
+        # Spans index into the decoded text, which the view keeps for field decoding
+        self._data, self._start, self._end = text, 0, len(text)
+        spans = {}
+        idx = JSON_WHITESPACE.match(text, 1).end()
+        while idx < len(text) and text[idx] == '"':
+            key, idx = json.decoder.scanstring(text, idx + 1)
+            idx = JSON_WHITESPACE.match(text, idx).end() + 1  # Past ':'
+            value_start = JSON_WHITESPACE.match(text, idx).end()
+            _, idx = JSON_SCANNER(text, value_start)
+            spans[key] = (value_start, idx)
+            idx = JSON_WHITESPACE.match(text, idx).end()
+            if text[idx] == ',':
+                idx = JSON_WHITESPACE.match(text, idx + 1).end()
+        return spans
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            start, end = self._key_spans()[key]
+            self._values[key] = json.loads(self._data[start:end])
+        return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._key_spans()
+
+    def __iter__(self):
+        return iter(self._key_spans())
+
+    def __len__(self):
+        return len(self._key_spans())
+
+    def raw(self):
+        """Undecoded bytes of the whole chunk."""
+        return self._data[self._start:self._end]
+
+    def to_dict(self):
+        """Decode the whole chunk into a plain dict."""
+        return json.loads(self.raw())
+
+
+class ChunkStore:
+    """Memory-mapped JSON array or JSONL chunk file, read as a sequence of ChunkViews.
+
+    Chunk byte spans come from the sidecar offset index when it is current, otherwise
+    from scanning the mapped file. Nothing is decoded until a view's field is accessed,
+    so memory use is bounded by what callers keep, not by the file size.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = map_file(path)
+        self.chunk_numbers = None
+        index = self._load_index()
+        if index is not None:
+            self.chunk_numbers, self.offsets, self.lengths = index
+        else:
+            self.offsets, self.lengths = scan_chunk_spans(self.data, detect_format(path))
+
+    def _load_index(self):
+        """Return (chunk_numbers, offsets, lengths) from a current sidecar index, or None."""
+        index_path = index_path_for(self.path)
+        if not os.path.isfile(index_path):
+            return None
+        # Read into arrays (24 bytes per chunk) rather than mapped, so no mapping or
+        # file handle outlives this call and the .idx can be rewritten at any time
+        with open(index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if len(header) < INDEX_HEADER.size:
+                return None
+            magic, count, data_size, data_mtime_ns = INDEX_HEADER.unpack(header)
+            # Rewritten files usually change size, but an in-place edit of the same length
+            # is only caught by the modification time
+            if (magic != INDEX_MAGIC or data_size != len(self.data)
+                    or data_mtime_ns != os.stat(self.path).st_mtime_ns):
+                return None
+            columns = []
+            for _ in range(3):
+                values = array('q')
+                try:
+                    values.fromfile(f, count)
+                except EOFError:
+                    return None  # Truncated index
+                columns.append(values)
+        return tuple(columns)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        offset = self.offsets[i]
+        return ChunkView(self.data, offset, offset + self.lengths[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def position(self, chunk_number):
+        """Array position of chunk_number, or None if it is not in the file."""
+        if self.chunk_numbers is None:
+            # No index: read just the chunk_number field of every chunk, once
+            self.chunk_numbers = array('q', (view.get('chunk_number') or 0 for view in self))
+        count = len(self.chunk_numbers)
+        if not count:
+            return None
+        # chunk_numbers are consecutive in parser output, so try the direct position first
+        guess = chunk_number - self.chunk_numbers[0]
+        if 0 <= guess < count and self.chunk_numbers[guess] == chunk_number:
+            return guess
+        i = bisect.bisect_left(self.chunk_numbers, chunk_number)
+        if i < count and self.chunk_numbers[i] == chunk_number:
+            return i
+        return None
+
+
+def remove_manifest(directory):
+    """Mark a store directory incomplete before its data files are rewritten."""
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def write_manifest_atomically(directory, manifest):
+    """Write a store directory's manifest.json once all of its data files are written.
+    
+    Readers treat the manifest as the mark of a complete store (columnar chunks, xref
+    graph, text index). It is written to a temporary file and renamed into place, so
+    they see either no manifest or a whole one.
+    """
+    manifest_path = os.path.join(directory, 'manifest.json')
+    temp_path = f'{manifest_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+# Columnar store layout: a directory with manifest.json plus one set of files per column.
+# Integer columns are native int64 arrays; string and JSON columns are a UTF-8 blob with
+# int64 start offsets (rows + 1 entries) and a one-byte-per-row null mask.
+COLUMNAR_FORMAT = 'sf-chunk-columns'
+INT_COLUMNS = ('chunk_number', 'character_count', 'chunk_index')
+STR_COLUMNS = ('chapter', 'article', 'section_id', 'title', 'content')
+JSON_COLUMNS = ('html_tags',)
+OTHER_COLUMN = 'other_fields'  # JSON object of every remaining chunk field
+
+
+def is_columnar(path):
+    """Check if path is a columnar chunk store directory."""
+    return os.path.isfile(os.path.join(path, 'manifest.json'))
+
+
+class ColumnarChunkWriter:
+    """Write chunks into a columnar store directory as they are produced."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Invalidate a previous store first: its manifest must not describe the new,
+        # partly written column files if this run is interrupted before close()
+        remove_manifest(directory)
+        self.count = 0
+        self.int_values = {name: array('q') for name in INT_COLUMNS}
+        self.blobs = {}
+        self.offsets = {}
+        self.nulls = {}
+        for name in STR_COLUMNS + JSON_COLUMNS + (OTHER_COLUMN,):
+            self.blobs[name] = open(os.path.join(directory, f'{name}.blob'), 'wb')
+            self.offsets[name] = array('q', [0])
+            self.nulls[name] = bytearray()
+
+    def _append_blob(self, name, text):
+        if text is None:
+            encoded = b''
+            self.nulls[name].append(1)
+        else:
+            encoded = text.encode('utf-8')
+            self.nulls[name].append(0)
+        self.blobs[name].write(encoded)
+        self.offsets[name].append(self.offsets[name][-1] + len(encoded))
+
+    def write(self, chunk):
+        for name in INT_COLUMNS:
+            self.int_values[name].append(chunk.get(name) or 0)
+        for name in STR_COLUMNS:
+            value = chunk.get(name)
+            self._append_blob(name, None if value is None else str(value))
+        for name in JSON_COLUMNS:
+            self._append_blob(name, json.dumps(chunk.get(name), ensure_ascii=False))
+        other = {k: v for k, v in chunk.items() if k not in INT_COLUMNS + STR_COLUMNS + JSON_COLUMNS}
+        self._append_blob(OTHER_COLUMN, json.dumps(other, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        for name, values in self.int_values.items():
+            with open(os.path.join(self.directory, f'{name}.i64'), 'wb') as f:
+                values.tofile(f)
+        for name, blob in self.blobs.items():
+            blob.close()
+            with open(os.path.join(self.directory, f'{name}.off'), 'wb') as f:
+                self.offsets[name].tofile(f)
+            with open(os.path.join(self.directory, f'{name}.null'), 'wb') as f:
+                f.write(self.nulls[name])
+        manifest = {
+            'format': COLUMNAR_FORMAT,
+            'version': 1,
+            'rows': self.count,
+            'int_columns': list(INT_COLUMNS),
+            'str_columns': list(STR_COLUMNS),
+            'json_columns': list(JSON_COLUMNS) + [OTHER_COLUMN]
+        }
+        write_manifest_atomically(self.directory, manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ColumnarChunkStore:
+    """Read a columnar chunk store, loading only the columns and rows a query touches.
+
+    Integer columns are read whole (8 bytes per row); string and JSON values are
+    decoded per row from a memory-mapped blob.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != COLUMNAR_FORMAT:
+            raise ValueError(f"{directory} is not a columnar chunk store")
+        self.rows = self.manifest['rows']
+        self._int_columns = {}
+        self._blob_columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def int_column(self, name):
+        """Return a whole integer column as an array('q')."""
+        if name not in self._int_columns:
+            values = array('q')
+            with open(os.path.join(self.directory, f'{name}.i64'), 'rb') as f:
+                values.fromfile(f, self.rows)
+            self._int_columns[name] = values
+        return self._int_columns[name]
+
+    def _blob_column(self, name):
+        if name not in self._blob_columns:
+            offsets = array('q')
+            with open(os.path.join(self.directory, f'{name}.off'), 'rb') as f:
+                offsets.fromfile(f, self.rows + 1)
+            with open(os.path.join(self.directory, f'{name}.null'), 'rb') as f:
+                nulls = f.read()
+            with open(os.path.join(self.directory, f'{name}.blob'), 'rb') as f:
+                # mmap cannot map an empty file
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b''
+            self._blob_columns[name] = (offsets, nulls, blob)
+        return self._blob_columns[name]
+
+    def value(self, name, row):
+        """Decode one column value for one row."""
+        if name in self.manifest['int_columns']:
+            return self.int_column(name)[row]
+        offsets, nulls, blob = self._blob_column(name)
+        if nulls[row]:
+            return None
+        text = blob[offsets[row]:offsets[row + 1]].decode('utf-8')
+        if name in self.manifest['json_columns']:
+            return json.loads(text)
+        return text
+
+    def position(self, chunk_number):
+        """Array position of chunk_number, or None if it is not in the store."""
+        chunk_numbers = self.int_column('chunk_number')
+        i = bisect.bisect_left(chunk_numbers, chunk_number)
+        if i < len(chunk_numbers) and chunk_numbers[i] == chunk_number:
+            return i
+        return None
+
+    def filter_rows(self, name, predicate):
+        """Return the rows whose integer column value satisfies predicate."""
+        return [row for row, value in enumerate(self.int_column(name)) if predicate(value)]
+
+    def chunk(self, row, fields=None):
+        """Materialize a chunk dict for one row, limited to fields if given."""
+        if fields is None:
+            chunk = self.value(OTHER_COLUMN, row)
+            for name in self.manifest['int_columns'] + self.manifest['str_columns'] + list(JSON_COLUMNS):
+                chunk[name] = self.value(name, row)
+            return chunk
+        other = None
+        chunk = {}
+        for name in fields:
+            if name in self.manifest['int_columns'] + self.manifest['str_columns'] + list(JSON_COLUMNS):
+                chunk[name] = self.value(name, row)
+            else:
+                if other is None:
+                    other = self.value(OTHER_COLUMN, row)
+                if name in other:
+                    chunk[name] = other[name]
+        return chunk
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.rows
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        return self.chunk(row)
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield self.chunk(row)
+
+
+OVERLAP_SEPARATOR = "\n"
+
+
+def resolve_content(chunks, position):
+    """Return the full content of chunks[position], including the overlap it references."""
+    chunk = chunks[position]
+    overlap = chunk.get('overlap')
+    if not overlap:
+        return chunk['content']
+    start, end = overlap
+    return chunks[position - 1]['content'][start:end] + OVERLAP_SEPARATOR + chunk['content']
+
+
+def iter_resolved_content(chunks):
+    """Yield (chunk, full content) in order, holding on to the previous chunk's content only."""
+    previous_content = None
+    for chunk in chunks:
+        content = chunk['content']
+        overlap = chunk.get('overlap')
+        if overlap:
+            start, end = overlap
+            yield chunk, previous_content[start:end] + OVERLAP_SEPARATOR + content
+        else:
+            yield chunk, content
+        previous_content = content
+
+
+def load_reference_table(path):
+    """Load a reference table written with parse_sf_code.py --reference-table."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resolve_references(chunk, reference_table=None):
+    """Return a chunk's reference dicts, looking up its reference_ids in the table if it has them."""
+    if 'reference_ids' in chunk:
+        return [reference_table[reference_id] for reference_id in chunk['reference_ids']]
+    return chunk.get('references', [])
+
+
+def open_chunks(path):
+    """Open a chunk file or columnar store as a lazily decoded sequence of chunks."""
+    if is_columnar(path):
+        return ColumnarChunkStore(path)
+    return ChunkStore(path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Chunk file utilities')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    index_args = subparsers.add_parser('index', help='Build the sidecar offset index for existing chunk files')
+    index_args.add_argument('files', nargs='+', help='JSON array or JSONL chunk files')
+    content_args = subparsers.add_parser('content', help='Print the full content of chunks, overlap included')
+    content_args.add_argument('file', help='JSON/JSONL chunk file or columnar store directory')
+    content_args.add_argument('chunk_numbers', type=int, nargs='+', metavar='CHUNK_NUM')
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        for path in args.files:
+            count = build_index(path)
+            print(f"Indexed {count} chunks in {index_path_for(path)}")
+    elif args.command == 'content':
+        chunks = open_chunks(args.file)
+        for chunk_number in args.chunk_numbers:
+            position = chunks.position(chunk_number)
+            if position is None:
+                print(f"Chunk #{chunk_number} not found")
+                continue
+            print(f"=== Chunk {chunk_number} ===")
+            print(resolve_content(chunks, position))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,27 @@
 Diff analyzer that compares SF code by article divisions.
 """
 
+import argparse
+import bisect
+import hashlib
 import json
+import multiprocessing
+import os
 import sys
 import re
+import time
+from collections import Counter
 from pathlib import Path
 from difflib import SequenceMatcher
+from itertools import accumulate
+from operator import add
+
+import chunk_store
 
 
 def load_json_chunks(json_path):
-    """Load the JSON chunks file."""
-    with open(json_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Open the chunks file (JSON array or JSONL) as memory-mapped chunks decoded on access."""
+    return chunk_store.open_chunks(json_path)
 
 
 def find_article_divisions(text):
@@ -115,50 +125,348 @@ def get_surrounding_context(text, start, end, context_size=400):
     return f"{before}[[[{diff_text}]]]{after}"
 
 
-def find_and_print_differences_for_article(raw_text, reconstructed_text, article_num, min_diff_size=200):
-    """Find and print differences for a specific article."""
-    # Store original texts for display
-    original_raw = raw_text
-    original_reconstructed = reconstructed_text
-    
+# Articles larger than this (normalized, either side) are aligned on landmarks first
+MAX_CHUNK_SIZE = 1000000  # 1MB
+# Character-level landmarks, tried in order to split an oversized window
+SECTION_LANDMARK_PATTERN = re.compile(r'SEC\. [0-9][0-9A-Za-z.\-]*')
+WORD_PATTERN = re.compile(r'\S+')
+
+
+def common_prefix_length(a, b, a_start, a_end, b_start, b_end):
+    """Length of the common prefix of a[a_start:a_end] and b[b_start:b_end] (binary search on slices)."""
+    low, high = 0, min(a_end - a_start, b_end - b_start)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[a_start:a_start + mid] == b[b_start:b_start + mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def common_suffix_length(a, b, a_start, a_end, b_start, b_end):
+    """Length of the common suffix of a[a_start:a_end] and b[b_start:b_end]."""
+    low, high = 0, min(a_end - a_start, b_end - b_start)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[a_end - mid:a_end] == b[b_end - mid:b_end]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def unique_landmarks(text, start, end, pattern):
+    """Map landmark text -> (start, end) for pattern matches occurring exactly once in text[start:end]."""
+    landmarks = {}
+    repeated = set()
+    for match in pattern.finditer(text, start, end):
+        key = match.group()
+        if key in landmarks:
+            repeated.add(key)
+        else:
+            landmarks[key] = match.span()
+    for key in repeated:
+        del landmarks[key]
+    return landmarks
+
+
+def section_landmarks(text, start, end):
+    """Unique 'SEC. <number>' headers in text[start:end]."""
+    return unique_landmarks(text, start, end, SECTION_LANDMARK_PATTERN)
+
+
+def word_landmarks(text, start, end):
+    """Unique words in text[start:end]."""
+    return unique_landmarks(text, start, end, WORD_PATTERN)
+
+
+def token_landmarks(tokens, start, end):
+    """Map token ID -> (position, position + 1) for tokens occurring exactly once in tokens[start:end]."""
+    window = tokens[start:end]
+    counts = Counter(window)
+    last_positions = dict(zip(window, range(start, end)))
+    return {token: (position, position + 1) for token, position in last_positions.items() if counts[token] == 1}
+
+
+# How each diff mode aligns a pair of sequences:
+#   max_window: largest window (items per side) handed to SequenceMatcher
+#   autojunk:   SequenceMatcher autojunk heuristic
+#   landmarks:  functions tried in order to split an oversized window at unique landmarks
+ALIGNMENT_MODES = {
+    # Characters of whitespace-normalized text (the original comparison)
+    'char': {
+        'max_window': 50000,
+        'autojunk': True,
+        'landmarks': [section_landmarks, word_landmarks]
+    },
+    # Interned word token IDs
+    'token': {
+        'max_window': 5000,
+        'autojunk': False,
+        'landmarks': [token_landmarks]
+    }
+}
+
+
+def longest_increasing_anchors(pairs):
+    """Longest chain of (a_span, b_span) pairs increasing on both sides (patience sorting).
+
+    pairs must be sorted by a position; returns the chain in that order.
+    """
+    tails = []  # tails[k]: b position of the last pair of the best chain of length k + 1
+    tail_indices = []
+    previous = [None] * len(pairs)
+    for i, (_, b_span) in enumerate(pairs):
+        k = bisect.bisect_left(tails, b_span[0])
+        if k == len(tails):
+            tails.append(b_span[0])
+            tail_indices.append(i)
+        else:
+            tails[k] = b_span[0]
+            tail_indices[k] = i
+        previous[i] = tail_indices[k - 1] if k > 0 else None
+    chain = []
+    i = tail_indices[-1] if tail_indices else None
+    while i is not None:
+        chain.append(pairs[i])
+        i = previous[i]
+    return chain[::-1]
+
+
+def sequence_matcher_opcodes(a, b, a_start, a_end, b_start, b_end, autojunk=True):
+    """SequenceMatcher opcodes for a window, shifted to whole-sequence offsets."""
+    matcher = SequenceMatcher(None, a[a_start:a_end], b[b_start:b_end], autojunk=autojunk)
+    return [(tag, i1 + a_start, i2 + a_start, j1 + b_start, j2 + b_start)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
+
+
+def anchored_opcodes(a, b, a_start, a_end, b_start, b_end, alignment, level=0):
+    """Opcodes for a[a_start:a_end] vs b[b_start:b_end], splitting oversized windows on landmarks.
+
+    a and b are strings or token lists. Common prefix/suffix are trimmed first. A window
+    still larger than alignment['max_window'] is split at the unique landmarks of
+    alignment['landmarks'][level] that appear in the same order on both sides, and the
+    gaps are aligned recursively. A window with no usable landmarks left is reported as
+    one replacement, which keeps time and memory bounded.
+    """
+    opcodes = []
+    prefix = common_prefix_length(a, b, a_start, a_end, b_start, b_end)
+    if prefix:
+        opcodes.append(('equal', a_start, a_start + prefix, b_start, b_start + prefix))
+        a_start += prefix
+        b_start += prefix
+    suffix = common_suffix_length(a, b, a_start, a_end, b_start, b_end)
+    a_end -= suffix
+    b_end -= suffix
+
+    if a_start == a_end or b_start == b_end:
+        if a_start < a_end:
+            opcodes.append(('delete', a_start, a_end, b_start, b_start))
+        elif b_start < b_end:
+            opcodes.append(('insert', a_start, a_start, b_start, b_end))
+    elif max(a_end - a_start, b_end - b_start) <= alignment['max_window']:
+        opcodes.extend(sequence_matcher_opcodes(a, b, a_start, a_end, b_start, b_end, alignment['autojunk']))
+    elif level < len(alignment['landmarks']):
+        find_landmarks = alignment['landmarks'][level]
+        a_landmarks = find_landmarks(a, a_start, a_end)
+        b_landmarks = find_landmarks(b, b_start, b_end)
+        pairs = sorted((span, b_landmarks[key]) for key, span in a_landmarks.items() if key in b_landmarks)
+        anchors = longest_increasing_anchors(pairs)
+        # Gaps between anchors may have landmarks of this kind that are unique locally;
+        # without any anchors, retry the whole window with the next landmark kind
+        gap_level = level if anchors else level + 1
+        i, j = a_start, b_start
+        for (ai1, ai2), (bj1, bj2) in anchors:
+            opcodes.extend(anchored_opcodes(a, b, i, ai1, j, bj1, alignment, gap_level))
+            opcodes.append(('equal', ai1, ai2, bj1, bj2))
+            i, j = ai2, bj2
+        opcodes.extend(anchored_opcodes(a, b, i, a_end, j, b_end, alignment, gap_level))
+    else:
+        opcodes.append(('replace', a_start, a_end, b_start, b_end))
+
+    if suffix:
+        opcodes.append(('equal', a_end, a_end + suffix, b_end, b_end + suffix))
+    return opcodes
+
+
+def tokenize(text, token_ids):
+    """Split whitespace-normalized text into word token IDs, interning new words into token_ids.
+
+    Returns (tokens, starts, ends) with each token's character span in text.
+    """
+    # normalize_whitespace() leaves single spaces only, so str.split and running sums of
+    # word lengths give the same tokens and spans as a regex scan, without a Python loop
+    words = text.split(' ') if text else []
+    for word in dict.fromkeys(words):
+        token_ids.setdefault(word, len(token_ids))
+    tokens = list(map(token_ids.__getitem__, words))
+    lengths = list(map(len, words))
+    starts = list(accumulate(map((1).__add__, lengths[:-1]), initial=0)) if words else []
+    ends = list(map(add, starts, lengths))
+    return tokens, starts, ends
+
+
+def token_span_to_chars(t1, t2, starts, ends, text_length):
+    """Character span of tokens[t1:t2]; an empty range maps to the position before token t1."""
+    if t1 == t2:
+        position = starts[t1] if t1 < len(starts) else text_length
+        return position, position
+    return starts[t1], ends[t2 - 1]
+
+
+def token_opcodes(normalized_raw, normalized_reconstructed):
+    """Align word tokens and map the opcodes back to character offsets."""
+    token_ids = {}
+    raw_tokens, raw_starts, raw_ends = tokenize(normalized_raw, token_ids)
+    recon_tokens, recon_starts, recon_ends = tokenize(normalized_reconstructed, token_ids)
+    opcodes = merge_opcodes(anchored_opcodes(raw_tokens, recon_tokens, 0, len(raw_tokens), 0, len(recon_tokens),
+                                             ALIGNMENT_MODES['token']))
+    char_opcodes = []
+    for tag, t1, t2, u1, u2 in opcodes:
+        i1, i2 = token_span_to_chars(t1, t2, raw_starts, raw_ends, len(normalized_raw))
+        j1, j2 = token_span_to_chars(u1, u2, recon_starts, recon_ends, len(normalized_reconstructed))
+        char_opcodes.append((tag, i1, i2, j1, j2))
+    return char_opcodes
+
+
+def merge_opcodes(opcodes):
+    """Merge adjacent opcodes the way SequenceMatcher reports them.
+
+    Window boundaries can split one difference into neighbouring pieces; runs of equal
+    opcodes are joined, and runs of differences become one delete/insert/replace.
+    """
+    merged = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2 and j1 == j2:
+            continue
+        if merged and (merged[-1][0] == 'equal') == (tag == 'equal'):
+            prev_tag, pi1, _, pj1, _ = merged[-1]
+            if tag != 'equal':
+                tag = 'replace' if (pi1 < i2 and pj1 < j2) else ('delete' if pi1 < i2 else 'insert')
+            merged[-1] = (tag, pi1, i2, pj1, j2)
+        else:
+            merged.append((tag, i1, i2, j1, j2))
+    return merged
+
+
+def compute_article_opcodes(normalized_raw, normalized_reconstructed, mode='char'):
+    """Opcodes (character offsets) aligning the normalized raw and reconstructed text of an article.
+
+    'char' mode compares characters: articles up to MAX_CHUNK_SIZE use one SequenceMatcher,
+    larger ones landmark-anchored alignment with bounded windows. 'token' mode compares
+    interned word tokens, always in bounded windows.
+    """
+    if mode == 'token':
+        return token_opcodes(normalized_raw, normalized_reconstructed)
+    if len(normalized_raw) > MAX_CHUNK_SIZE or len(normalized_reconstructed) > MAX_CHUNK_SIZE:
+        return merge_opcodes(anchored_opcodes(normalized_raw, normalized_reconstructed,
+                                              0, len(normalized_raw), 0, len(normalized_reconstructed),
+                                              ALIGNMENT_MODES['char']))
+    return list(SequenceMatcher(None, normalized_raw, normalized_reconstructed).get_opcodes())
+
+
+def missing_text_context(text, position, missing_length, context_size=400):
+    """Context around position with '%-' markers standing in for missing_length characters."""
+    context_start = max(0, position - context_size)
+    context_end = min(len(text), position + context_size)
+    before = text[context_start:position]
+    after = text[position:context_end]
+    markers = '%-' * (missing_length // 2) + '%' * (missing_length % 2)
+    return f"{before}[[[{markers}]]]{after}"
+
+
+def difference_record(tag, i1, i2, j1, j2, normalized_raw, normalized_reconstructed):
+    """Describe one difference, including its context in both texts, as a plain dict."""
+    raw_part = normalized_raw[i1:i2]
+    reconstructed_part = normalized_reconstructed[j1:j2]
+    if tag == 'delete':
+        # For missing text in reconstructed, show where it should be with markers
+        raw_context = get_surrounding_context(normalized_raw, i1, i2)
+        reconstructed_context = missing_text_context(normalized_reconstructed, j1, len(raw_part))
+    elif tag == 'insert':
+        # For extra text in reconstructed, show where it's missing in raw with markers
+        raw_context = missing_text_context(normalized_raw, i1, len(reconstructed_part))
+        reconstructed_context = get_surrounding_context(normalized_reconstructed, j1, j2)
+    else:
+        raw_context = get_surrounding_context(normalized_raw, i1, i2)
+        reconstructed_context = get_surrounding_context(normalized_reconstructed, j1, j2)
+    return {
+        'tag': tag,
+        'raw_start': i1,
+        'raw_end': i2,
+        'reconstructed_start': j1,
+        'reconstructed_end': j2,
+        'raw_text': raw_part,
+        'reconstructed_text': reconstructed_part,
+        'raw_context': raw_context,
+        'reconstructed_context': reconstructed_context
+    }
+
+
+def print_article_difference(diff, article_num, diff_count):
+    """Print one difference record with its context in both texts."""
+    raw_part = diff['raw_text']
+    reconstructed_part = diff['reconstructed_text']
+    
+    # Determine the type of difference
+    if diff['tag'] == 'delete':
+        # Text present in raw, missing in reconstructed
+        print("\n" + "-" * 80)
+        print(f"Article {article_num} - Diff {diff_count}: {len(raw_part)} characters present in RAW, missing in RECONSTRUCTED")
+        print(f"Missing text: {repr(raw_part)}")
+        print(f"\nRAW text context:")
+        print(diff['raw_context'])
+        print(f"\nRECONSTRUCTED text context (at position {diff['reconstructed_start']}):")
+        print(diff['reconstructed_context'])
+        
+    elif diff['tag'] == 'insert':
+        # Text present in reconstructed, missing in raw
+        print("\n" + "+" * 80)
+        print(f"Article {article_num} - Diff {diff_count}: {len(reconstructed_part)} characters present in RECONSTRUCTED, missing in RAW")
+        print(f"Extra text: {repr(reconstructed_part)}")
+        print(f"\nRAW text context (at position {diff['raw_start']}):")
+        print(diff['raw_context'])
+        print(f"\nRECONSTRUCTED text context:")
+        print(diff['reconstructed_context'])
+        
+    elif diff['tag'] == 'replace':
+        # Text different between raw and reconstructed
+        print("\n" + "=" * 80)
+        print(f"Article {article_num} - Diff {diff_count}: REPLACEMENT - {len(raw_part)} chars in RAW replaced by {len(reconstructed_part)} chars in RECONSTRUCTED")
+        print(f"RAW text: {repr(raw_part)}")
+        print(f"RECONSTRUCTED text: {repr(reconstructed_part)}")
+        print(f"\nRAW text context:")
+        print(diff['raw_context'])
+        print(f"\nRECONSTRUCTED text context:")
+        print(diff['reconstructed_context'])
+
+
+def find_article_differences(raw_text, reconstructed_text, article_num, min_diff_size=200, mode='char'):
+    """Find the differences for a specific article without printing them.
+    
+    Returns {'article', 'very_large', 'differences', 'stats'}, where differences are
+    difference_record() dicts for the differences worth reporting and stats covers all
+    of them: normalized lengths, differing characters, similarity ratio and time taken.
+    """
+    start_time = time.time()
     # Normalize whitespace for comparison
     normalized_raw = normalize_whitespace(raw_text)
     normalized_reconstructed = normalize_whitespace(reconstructed_text)
+    very_large = mode == 'char' and (len(normalized_raw) > MAX_CHUNK_SIZE or len(normalized_reconstructed) > MAX_CHUNK_SIZE)
     
-    # For very large articles, process in chunks
-    MAX_CHUNK_SIZE = 1000000  # 1MB chunks
-    
-    if len(normalized_raw) > MAX_CHUNK_SIZE or len(normalized_reconstructed) > MAX_CHUNK_SIZE:
-        print(f"  Article {article_num} is very large, processing in chunks...")
-        # For now, just do a simple comparison
-        if normalized_raw == normalized_reconstructed:
-            print(f"  Article {article_num} content is IDENTICAL despite large size")
-            return 0
-        else:
-            print(f"  Article {article_num} content DIFFERS - skipping detailed analysis due to size")
-            print(f"  Size difference: {len(normalized_reconstructed) - len(normalized_raw)} chars")
-            return 1
-    
-    # Use SequenceMatcher for efficient difference finding on normalized text
-    matcher = SequenceMatcher(None, normalized_raw, normalized_reconstructed)
-    
-    diff_count = 0
-    
-    # Get all opcodes (differences)
-    opcodes = list(matcher.get_opcodes())
-    
-    for idx, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+    differences = []
+    matching_chars = 0
+    differing_chars = 0
+    for tag, i1, i2, j1, j2 in compute_article_opcodes(normalized_raw, normalized_reconstructed, mode):
         if tag == 'equal':
+            matching_chars += i2 - i1
             continue
+        differing_chars += max(i2 - i1, j2 - j1)
         
-        # Extract the different parts from normalized text
-        norm_raw_part = normalized_raw[i1:i2]
-        norm_reconstructed_part = normalized_reconstructed[j1:j2]
-        
-        # For display, we need to map back to original text positions
-        # This is approximate but should be close enough for context
-        raw_part = norm_raw_part  # We'll show the normalized diff
-        reconstructed_part = norm_reconstructed_part
+        # We show the normalized diff
+        raw_part = normalized_raw[i1:i2]
+        reconstructed_part = normalized_reconstructed[j1:j2]
         
         # Check if we should ignore this difference
         if should_ignore_diff(raw_part) and should_ignore_diff(reconstructed_part):
@@ -169,71 +477,220 @@ def find_and_print_differences_for_article(raw_text, reconstructed_text, article
         if max_diff_len < min_diff_size:
             continue
         
-        diff_count += 1
+        differences.append(difference_record(tag, i1, i2, j1, j2, normalized_raw, normalized_reconstructed))
+    
+    total_length = len(normalized_raw) + len(normalized_reconstructed)
+    stats = {
+        'raw_length': len(normalized_raw),
+        'reconstructed_length': len(normalized_reconstructed),
+        'differing_chars': differing_chars,
+        # Same definition as SequenceMatcher.ratio(): 2 * matches / total length
+        'ratio': 2.0 * matching_chars / total_length if total_length else 1.0,
+        'elapsed_seconds': time.time() - start_time
+    }
+    return {'article': article_num, 'very_large': very_large, 'differences': differences, 'stats': stats}
+
+
+def print_article_differences(result):
+    """Print the differences found for one article; returns how many there were."""
+    article_num = result['article']
+    if result['very_large']:
+        print(f"  Article {article_num} is very large, aligning on section landmarks...")
+    for diff_count, diff in enumerate(result['differences'], 1):
+        print_article_difference(diff, article_num, diff_count)
+    return len(result['differences'])
+
+
+def find_and_print_differences_for_article(raw_text, reconstructed_text, article_num, min_diff_size=200, mode='char'):
+    """Find and print differences for a specific article ('char' or 'token' diff mode)."""
+    return print_article_differences(find_article_differences(raw_text, reconstructed_text, article_num,
+                                                              min_diff_size, mode))
+
+
+class DiffReportWriter:
+    """Write machine-readable diff report records as JSONL (streamed) or a JSON array.
+
+    Record types: 'run' (settings and totals, written last), 'article' (per-article
+    summary) and 'difference' (one per reported difference, after its article).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = chunk_store.format_for_path(path)
+        self.records = []  # Only used for JSON array output
+        self.file = open(path, 'w', encoding='utf-8') if self.format == 'jsonl' else None
+
+    def write(self, record):
+        if self.file is not None:
+            self.file.write(json.dumps(record, ensure_ascii=False))
+            self.file.write('\n')
+        else:
+            self.records.append(record)
+
+    def write_article(self, result, mode, min_diff_size):
+        """Write the summary record for one article, followed by its difference records."""
+        self.write({
+            'type': 'article',
+            'article': result['article'],
+            'mode': mode,
+            'min_diff_size': min_diff_size,
+            'reported_differences': len(result['differences']),
+            'cached': result.get('cached', False),
+            **result['stats']
+        })
+        for diff_number, diff in enumerate(result['differences'], 1):
+            self.write({
+                'type': 'difference',
+                'article': result['article'],
+                'diff_number': diff_number,
+                'tag': diff['tag'],
+                'raw_start': diff['raw_start'],
+                'raw_end': diff['raw_end'],
+                'raw_length': diff['raw_end'] - diff['raw_start'],
+                'reconstructed_start': diff['reconstructed_start'],
+                'reconstructed_end': diff['reconstructed_end'],
+                'reconstructed_length': diff['reconstructed_end'] - diff['reconstructed_start'],
+                'raw_text': diff['raw_text'],
+                'reconstructed_text': diff['reconstructed_text'],
+                'raw_context': diff['raw_context'],
+                'reconstructed_context': diff['reconstructed_context']
+            })
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        else:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.records, f, indent=2, ensure_ascii=False)
+
+
+def article_comparison_tasks(raw_text, reconstructed_text, raw_dict, recon_dict, common_articles, min_diff_size, mode):
+    """Yield compare_article() tasks for articles whose text differs, in article order.
+    
+    Only the two article slices go into a task, never the full texts.
+    """
+    for article_num in sorted(common_articles):
+        raw_art_text = extract_article_text(raw_text, raw_dict[article_num])
+        recon_art_text = extract_article_text(reconstructed_text, recon_dict[article_num])
         
-        # Determine the type of difference
-        if tag == 'delete':
-            # Text present in raw, missing in reconstructed
-            print("\n" + "-" * 80)
-            print(f"Article {article_num} - Diff {diff_count}: {len(raw_part)} characters present in RAW, missing in RECONSTRUCTED")
-            print(f"Missing text: {repr(raw_part)}")
-            print(f"\nRAW text context:")
-            print(get_surrounding_context(normalized_raw, i1, i2))
-            print(f"\nRECONSTRUCTED text context (at position {j1}):")
-            # For missing text in reconstructed, show where it should be with markers
-            context_start = max(0, j1 - 400)
-            context_end = min(len(normalized_reconstructed), j1 + 400)
-            before = normalized_reconstructed[context_start:j1]
-            after = normalized_reconstructed[j1:context_end]
-            markers = '%-' * (len(raw_part) // 2) + '%' * (len(raw_part) % 2)
-            print(f"{before}[[[{markers}]]]{after}")
-            
-        elif tag == 'insert':
-            # Text present in reconstructed, missing in raw
-            print("\n" + "+" * 80)
-            print(f"Article {article_num} - Diff {diff_count}: {len(reconstructed_part)} characters present in RECONSTRUCTED, missing in RAW")
-            print(f"Extra text: {repr(reconstructed_part)}")
-            print(f"\nRAW text context (at position {i1}):")
-            # For extra text in raw, show where it's missing with markers
-            context_start = max(0, i1 - 400)
-            context_end = min(len(normalized_raw), i1 + 400)
-            before = normalized_raw[context_start:i1]
-            after = normalized_raw[i1:context_end]
-            markers = '%-' * (len(reconstructed_part) // 2) + '%' * (len(reconstructed_part) % 2)
-            print(f"{before}[[[{markers}]]]{after}")
-            print(f"\nRECONSTRUCTED text context:")
-            print(get_surrounding_context(normalized_reconstructed, j1, j2))
-            
-        elif tag == 'replace':
-            # Text different between raw and reconstructed
-            print("\n" + "=" * 80)
-            print(f"Article {article_num} - Diff {diff_count}: REPLACEMENT - {len(raw_part)} chars in RAW replaced by {len(reconstructed_part)} chars in RECONSTRUCTED")
-            print(f"RAW text: {repr(raw_part)}")
-            print(f"RECONSTRUCTED text: {repr(reconstructed_part)}")
-            print(f"\nRAW text context:")
-            print(get_surrounding_context(normalized_raw, i1, i2))
-            print(f"\nRECONSTRUCTED text context:")
-            print(get_surrounding_context(normalized_reconstructed, j1, j2))
-    
-    return diff_count
+        # Quick check if they're identical - don't print anything for identical articles
+        if raw_art_text != recon_art_text:
+            yield (article_num, raw_art_text, recon_art_text, min_diff_size, mode)
+
+
+# Bump when the diff engine or result layout changes, so stale cache entries are not reused
+DIFF_CACHE_VERSION = 1
+
+
+def article_cache_key(normalized_raw, normalized_reconstructed, min_diff_size, mode):
+    """Content address of an article comparison: its normalized slices and diff settings."""
+    parts = [str(DIFF_CACHE_VERSION), mode, str(min_diff_size),
+             hashlib.sha256(normalized_raw.encode('utf-8')).hexdigest(),
+             hashlib.sha256(normalized_reconstructed.encode('utf-8')).hexdigest()]
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class DiffCache:
+    """Directory of article comparison results, one JSON file per article_cache_key()."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def get(self, key, article_num):
+        """Stored result for key (relabelled as article_num), or None."""
+        path = self._path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        self.hits += 1
+        # Identical slices may come from another article number
+        result['article'] = article_num
+        result['cached'] = True
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so an interrupted run never leaves a truncated entry
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+
+def compare_article(task):
+    """Worker entry point: task is (article_num, raw_slice, reconstructed_slice, min_diff_size, mode)."""
+    article_num, raw_art_text, recon_art_text, min_diff_size, mode = task
+    return find_article_differences(raw_art_text, recon_art_text, article_num, min_diff_size, mode)
+
+
+def run_comparisons(tasks, jobs=1, cache=None):
+    """Yield compare_article() results in task order.
+    
+    Results come from the cache when an article's normalized slices are unchanged;
+    the rest are computed, in a pool of jobs worker processes if jobs > 1, and stored.
+    """
+    entries = []  # (cache key, cached result or None) per task, in order
+    if cache is not None:
+        # Resolve cache hits first, so only the misses are shipped to workers
+        pending_tasks = []
+        for article_num, raw_art_text, recon_art_text, min_diff_size, mode in tasks:
+            normalized_raw = normalize_whitespace(raw_art_text)
+            normalized_reconstructed = normalize_whitespace(recon_art_text)
+            key = article_cache_key(normalized_raw, normalized_reconstructed, min_diff_size, mode)
+            result = cache.get(key, article_num)
+            if result is None:
+                # Normalizing is idempotent, so workers can be given the normalized slices
+                pending_tasks.append((article_num, normalized_raw, normalized_reconstructed, min_diff_size, mode))
+            entries.append((key, result))
+    else:
+        pending_tasks = tasks
+    
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    try:
+        # imap keeps results in task order while workers run ahead
+        computed = pool.imap(compare_article, pending_tasks) if pool else map(compare_article, pending_tasks)
+        if cache is None:
+            yield from computed
+            return
+        for key, result in entries:
+            if result is None:
+                result = next(computed)
+                cache.put(key, result)
+            yield result
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
 
 def main():
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("Usage: python diff_analyzer.py <json_file> [min_diff_size]")
-        print("  min_diff_size: minimum character difference to display (default: 200)")
-        sys.exit(1)
-    
-    json_path = Path(sys.argv[1])
-    
-    # Get minimum difference size from command line or use default
-    MIN_DIFF_SIZE = 200
-    if len(sys.argv) == 3:
-        try:
-            MIN_DIFF_SIZE = int(sys.argv[2])
-        except ValueError:
-            print(f"Error: min_diff_size must be an integer, got '{sys.argv[2]}'")
-            sys.exit(1)
+    parser_args = argparse.ArgumentParser(description='Compare reconstructed chunk text with the raw SF code text by article')
+    parser_args.add_argument('json_file', help="Chunks file (JSON, JSONL or columnar store)")
+    parser_args.add_argument('min_diff_size', nargs='?', type=int, default=200,
+                            help="Minimum character difference to display (default: 200)")
+    parser_args.add_argument('--mode', choices=list(ALIGNMENT_MODES), default='char',
+                            help="Align characters (original) or interned word tokens (much faster on long articles) "
+                                 "(default: char)")
+    parser_args.add_argument('--report', metavar='FILE',
+                            help="Also write per-article summaries and per-difference records to FILE "
+                                 "(JSONL for .jsonl/.ndjson, otherwise a JSON array)")
+    parser_args.add_argument('--cache', metavar='DIR',
+                            help="Reuse results for articles whose normalized text and settings are unchanged, "
+                                 "stored in DIR")
+    parser_args.add_argument('--jobs', type=int, default=1, metavar='N',
+                            help="Compare articles in N worker processes; output stays in article order (default: 1)")
+    args = parser_args.parse_args()
+    
+    json_path = Path(args.json_file)
+    MIN_DIFF_SIZE = args.min_diff_size
     if not json_path.exists():
         print(f"Error: JSON file not found: {json_path}")
         sys.exit(1)
@@ -321,26 +778,46 @@ def main():
     print("=" * 80)
     
     total_diffs = 0
+    start_time = time.time()
+    report = DiffReportWriter(args.report) if args.report else None
     
-    for article_num in sorted(common_articles):
-        raw_art = raw_dict[article_num]
-        recon_art = recon_dict[article_num]
-        
-        raw_art_text = extract_article_text(raw_text, raw_art)
-        recon_art_text = extract_article_text(reconstructed_text, recon_art)
+    cache = DiffCache(args.cache) if args.cache else None
+    
+    tasks = article_comparison_tasks(raw_text, reconstructed_text, raw_dict, recon_dict, common_articles,
+                                     MIN_DIFF_SIZE, args.mode)
+    
+    articles_compared = 0
+    for result in run_comparisons(tasks, args.jobs, cache):
+        article_diffs = print_article_differences(result)
+        total_diffs += article_diffs
+        articles_compared += 1
+        if report:
+            report.write_article(result, args.mode, MIN_DIFF_SIZE)
         
-        # Quick check if they're identical
-        if raw_art_text == recon_art_text:
-            # Don't print anything for identical articles
-            pass
-        else:
-            # Analyze differences
-            article_diffs = find_and_print_differences_for_article(raw_art_text, recon_art_text, article_num, MIN_DIFF_SIZE)
-            total_diffs += article_diffs
-            
-            # Only print header if we found differences
-            if article_diffs > 0:
-                print(f"\nFound {article_diffs} differences >= {MIN_DIFF_SIZE} chars in Article {article_num}")
+        # Only print header if we found differences
+        if article_diffs > 0:
+            print(f"\nFound {article_diffs} differences >= {MIN_DIFF_SIZE} chars in Article {result['article']}")
+    
+    if cache:
+        print(f"\nDiff cache: {cache.hits} articles reused, {cache.misses} compared")
+    
+    if report:
+        report.write({
+            'type': 'run',
+            'json_file': str(json_path),
+            'raw_file': str(raw_text_path),
+            'mode': args.mode,
+            'min_diff_size': MIN_DIFF_SIZE,
+            'common_articles': len(common_articles),
+            'articles_compared': articles_compared,
+            'missing_in_reconstructed': sorted(missing_in_recon),
+            'extra_in_reconstructed': sorted(extra_in_recon),
+            'total_differences': total_diffs,
+            'cache_hits': cache.hits if cache else 0,
+            'elapsed_seconds': time.time() - start_time
+        })
+        report.close()
+        print(f"Saved diff report to: {args.report}")
     
     print(f"\n{'=' * 80}")
     print(f"Analysis complete! Total differences >= {MIN_DIFF_SIZE} chars found: {total_diffs}")
@@ -4,28 +4,730 @@ Parse San Francisco Municipal Code HTML and create chunked dictionaries with met
 """
 
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString
+from bs4.builder import builder_registry
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser, HTMLParserTreeBuilder
 from typing import List, Dict, Any
 import json
 import sys
 from datetime import datetime, timezone
 import argparse
+import functools
+import hashlib
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import tracemalloc
+import uuid
+from chunk_store import ColumnarChunkWriter, JsonArrayChunkWriter, JsonlChunkWriter, format_for_path, load_chunks
+from text_index import TextIndexWriter
+from xref_graph import XrefGraphWriter
 
 # Configuration
 CONFIG = {
     'input_file': 'rawcodes/san_francisco-ca-complete.html',
     'max_chunk_size': 2000,
-    'congressionalrag_path': '/Users/helen/hack/git/congressionalrag'
+    'stream_block_size': 1024 * 1024,  # Characters fed to the HTML parser per read in streaming mode
+    'backend': 'html.parser',  # BeautifulSoup tree builder ('html.parser' or 'lxml')
+    'partitions_per_worker': 4,  # Document partitions per worker process in parallel mode
+    'length_function': 'chars',  # How max_chunk_size is measured (see make_length_function)
+    'chunk_overlap': 0,  # Characters of a size-split chunk repeated (by reference) at the start of the next
+    'text_size_cache_size': 65536,  # Element texts whose size is remembered by a non-character length function
+    'link_cache_size': 65536,  # Distinct internal link strings whose resolved reference is remembered
+    'progress_interval': 10.0,  # Seconds between progress reports during a parse
+    'doc_uuid': 'congressionalrag',  # Where chunk uuids come from (see make_doc_uuid_function)
+    'congressionalrag_path': os.environ.get('CONGRESSIONALRAG_PATH')  # congressionalrag helpers checkout
 }
 
-# Add the congressionalrag helpers to path
-sys.path.append(CONFIG['congressionalrag_path'])
-from helpers.helpers import generate_doc_uuid
+# Text inclusion states passed down the tree by extract_text_from_element
+TEXT_INCLUDE = 0          # No AnnotationDrawer, EdNote or nested rbox above: include
+TEXT_IN_NESTED_RBOX = 1   # Inside a nested rbox with no EdNote below it: skip
+TEXT_IN_ANNOTATION = 2    # Nearest AnnotationDrawer/EdNote ancestor is an AnnotationDrawer: skip
+TEXT_EDITOR_NOTE = 3      # Nearest AnnotationDrawer/EdNote ancestor is an EdNote: include
+
+# Hierarchy tags with extraction rules, highest level first
+HIERARCHY_TAGS = [
+    {
+        'tag': 'Chapter', 
+        'type': 'Chapter', 
+        'fields': ['chapter'],
+        'extractors': {}
+    },
+    {
+        'tag': 'Article', 
+        'type': 'Article', 
+        'fields': ['article', 'article_number', 'article_title'],
+        'extractors': {
+            'article_number': r'^(ARTICLE\s+)?(\d+[A-Z]?-?\d*\.?|\b[IVXLCDM]+\b)[:.]?\s+(.+)',
+            'article_title': lambda match: match.group(3) if match else None
+        }
+    },
+    {
+        'tag': 'Division', 
+        'type': 'Division', 
+        'fields': ['division'],
+        'extractors': {}
+    },
+    {
+        'tag': 'Section', 
+        'type': 'Section', 
+        'fields': ['section_title', 'section_number'],
+        'extractors': {
+            'section_number': r'SEC\.\s*(\d+\.?\d*)'
+        }
+    },
+    {
+        'tag': 'Subsection', 
+        'type': 'Subsection', 
+        'fields': ['subsection'],
+        'extractors': {}
+    }
+]
+
+# Compiled extractor patterns of HIERARCHY_TAGS (and any other extractor strings used)
+EXTRACTOR_PATTERNS = {
+    pattern: re.compile(pattern, re.IGNORECASE)
+    for hier_config in HIERARCHY_TAGS
+    for pattern in hier_config['extractors'].values()
+    if isinstance(pattern, str)
+}
+
+
+def extractor_pattern(pattern: str):
+    """Compile an extractor regex once; extractors match case-insensitively."""
+    compiled = EXTRACTOR_PATTERNS.get(pattern)
+    if compiled is None:
+        compiled = EXTRACTOR_PATTERNS[pattern] = re.compile(pattern, re.IGNORECASE)
+    return compiled
+
+
+# Anchors of structural elements
+JD_ANCHOR_PATTERN = re.compile(r'JD_.*')
+
+# Internal link ('Link to=') components
+LINK_PATHNAME_PATTERN = re.compile(r"pathname: '([^']+)'")
+LINK_HASH_PATTERN = re.compile(r"hash: '(#[^']+)'")
+LINK_JD_HASH_PATTERN = re.compile(r"hash: '#(JD_[^']+)'")
+ARTICLE_REF_PATTERN = re.compile(r'Article([IVXLCDM]+|[\d\w-]+)')
+APPENDIX_SECTION_REF_PATTERN = re.compile(r'^A\d')
+SECTION_REF_PATTERN = re.compile(r'^\d')
+
+# History div text
+HISTORY_ADDED_PATTERN = re.compile(r'Added by\s+(.*?)(?:;|$)', re.IGNORECASE)
+HISTORY_AMENDED_PATTERN = re.compile(r'Amended by\s+(.*?)(?:;|$)', re.IGNORECASE)
+HISTORY_SEE_PATTERN = re.compile(r'see\s+([^;)]+)', re.IGNORECASE)
+ORDINANCE_PATTERN = re.compile(r'Ord\.?\s*([^;\s,)]+)')
+
+# String types get_text() returns for link and History text (no comments, doctypes, etc.)
+LINK_TEXT_STRING_TYPES = (NavigableString, CData)
+
+# Stack marker for the end of a subtree whose text extract_element_contents is collecting
+CLOSE_COLLECTOR = object()
+
+# Namespace of the built-in name-based (uuid5) doc UUIDs. Not yet checked against the
+# congressionalrag helper, which is why the helper stays the default source
+DOC_UUID_NAMESPACE = uuid.NAMESPACE_DNS
+
+
+def builtin_doc_uuid(doc_id: str) -> str:
+    """Deterministic UUID of a doc_id: uuid5 of the doc_id in DOC_UUID_NAMESPACE."""
+    return str(uuid.uuid5(DOC_UUID_NAMESPACE, doc_id))
+
+
+DOC_UUID_SOURCES = ('congressionalrag', 'builtin')
+
+
+def make_doc_uuid_function(source: str, path: str = None):
+    """Return the function that maps a doc_id to its chunk uuid.
+    
+    - 'congressionalrag': generate_doc_uuid from the congressionalrag helpers checkout
+      at path (default CONFIG['congressionalrag_path'], from $CONGRESSIONALRAG_PATH),
+      which produced the uuids of all earlier outputs
+    - 'builtin': builtin_doc_uuid, self-contained but not yet confirmed to give the
+      helper's values, so only used when asked for
+    
+    The helper is imported here, not at module import, so importing this module does
+    not depend on it.
+    """
+    if source == 'builtin':
+        return builtin_doc_uuid
+    if source != 'congressionalrag':
+        raise ValueError(f"Unknown doc UUID source '{source}' (use {', '.join(DOC_UUID_SOURCES)})")
+    return congressionalrag_doc_uuid(path or CONFIG['congressionalrag_path'])
+
+
+@functools.lru_cache(maxsize=None)
+def congressionalrag_doc_uuid(path: str):
+    """Import generate_doc_uuid from a congressionalrag helpers checkout (once per path)."""
+    if not path or not os.path.isdir(path):
+        raise ImportError("congressionalrag doc UUIDs need the helpers checkout: set CONGRESSIONALRAG_PATH "
+                          "or pass --congressionalrag-path (or choose --doc-uuid builtin)")
+    if path not in sys.path:
+        sys.path.append(path)
+    from helpers.helpers import generate_doc_uuid as helper_doc_uuid
+    return helper_doc_uuid
+
+
+def generate_doc_uuid(doc_id: str) -> str:
+    """Deterministic UUID of a doc_id from the configured source (CONFIG['doc_uuid'])."""
+    return make_doc_uuid_function(CONFIG['doc_uuid'])(doc_id)
+
+
+def has_target_class(tag):
+    """Identify the elements the parser processes: rbox divs and footnote tables."""
+    if tag.name == 'div':
+        classes = tag.get('class', [])
+        return any('rbox' in c for c in classes)
+    elif tag.name == 'table':
+        classes = tag.get('class', [])
+        return 'footnote' in classes
+    # Note: Footnote marker spans are already captured inside rbox text
+    # Note: Only 14 <p> tags exist in the document, mostly empty
+    return False
+
+
+class StreamingSoup(BeautifulSoup):
+    """BeautifulSoup tree that hands off each top-level target element as soon as it closes.
+
+    The tree is built by the normal tree builder for the chosen backend, so every element
+    passed to the callback is identical (text, attributes, sourceline) to the one a full
+    parse would produce. Once the callback returns, the element is removed from the tree
+    and decomposed, so memory stays bounded by the largest top-level rbox.
+    """
+
+    def __init__(self, on_element_closed, backend: str = 'html.parser'):
+        self._on_element_closed = on_element_closed
+        self._open_root = None
+        self._open_root_depth = 0
+        super().__init__('', backend)
+
+    def handle_starttag(self, *args, **kwargs):
+        tag = super().handle_starttag(*args, **kwargs)
+        if tag is not None and self._open_root is None and has_target_class(tag):
+            self._open_root = tag
+            self._open_root_depth = len(self.tagStack) - 1
+        return tag
+
+    def handle_endtag(self, *args, **kwargs):
+        super().handle_endtag(*args, **kwargs)
+        if self._open_root is not None and len(self.tagStack) <= self._open_root_depth:
+            self._release_open_root()
+
+    def _release_open_root(self):
+        """Hand the closed top-level element to the callback, then drop it from the tree."""
+        root = self._open_root
+        self._open_root = None
+        self._on_element_closed(root)
+        # Link the next parsed element to whatever preceded the dropped subtree
+        self._most_recent_element = root.previous_element
+        # A just-closed element is its parent's last child; passing the index avoids
+        # a linear search through the parent's (ever-growing) contents
+        parent = root.parent
+        if parent is not None and parent.contents and parent.contents[-1] is root:
+            root.extract(len(parent.contents) - 1)
+        root.decompose()
+
+    def feed_file(self, file_obj, block_size, progress=None):
+        """Feed an open text file through the backend's incremental parser block by block.
+        
+        With a ProgressReporter, its bytes_done follows the file's byte position.
+        """
+        raw_file = getattr(file_obj, 'buffer', None) if progress is not None else None
+        if isinstance(self.builder, HTMLParserTreeBuilder):
+            args, kwargs = self.builder.parser_args
+            parser = BeautifulSoupHTMLParser(self, *args, **kwargs)
+        elif hasattr(self.builder, 'parser_for'):
+            # lxml tree builders drive an lxml feed parser with the builder as its target
+            self.builder.soup = self
+            parser = self.builder.parser_for(None)
+        else:
+            raise ValueError(f"Backend '{self.builder.NAME}' does not support streaming")
+        while True:
+            block = file_obj.read(block_size)
+            if not block:
+                break
+            parser.feed(block)
+            if raw_file is not None:
+                progress.bytes_done = raw_file.tell()
+        parser.close()
+        # Close out any unfinished strings and tags, as BeautifulSoup does after a full parse
+        self.endData()
+        while self.currentTag is not None and self.currentTag.name != self.ROOT_TAG_NAME:
+            self.popTag()
+        if self._open_root is not None:
+            self._release_open_root()
+
+
+class ElementRecord:
+    """Picklable stand-in for a parsed rbox/footnote element.
+    
+    Carries the tag name, class/id attributes and source line that the chunking logic
+    reads from an element, plus everything extracted from its subtree, so chunking can
+    run without the bs4 tree (e.g. on results returned by worker processes).
+    """
+    
+    def __init__(self, name, attrs, sourceline=None):
+        self.name = name
+        self.attrs = attrs
+        self.sourceline = sourceline
+        self.text = ""
+        self.structural_data = None  # _extract_structural_data() result for structural elements
+        self.div_class = None  # Inner content div class of Normal-Level elements
+        self.links = None  # div_links_extract_all() result for Normal-Level elements
+        self.history = None  # div_history_extract() result for Normal-Level elements
+        self.is_footnote = False
+        self.new_ordinance_links = None  # div_links_extract_all() result for New Ordinance Notices
+    
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a record from its __dict__ (as stored in the incremental block cache)."""
+        record = cls.__new__(cls)
+        record.__dict__.update(data)
+        return record
+
+
+class ChunkText:
+    """Text of the chunk being assembled, kept as its element texts plus running totals.
+    
+    The text is only joined (with a newline between elements) when it is read, so
+    appending an element costs the same however long the chunk already is. Besides
+    its length in characters, the chunk keeps a running size: the sum of its element
+    sizes and separators as measured by the parser's length function.
+    """
+    
+    __slots__ = ('parts', 'length', 'size', 'separator_size', 'overlap', 'overlap_text', 'overlap_size')
+    
+    def __init__(self, separator_size=1):
+        self.parts = []
+        self.length = 0
+        self.size = 0
+        self.separator_size = separator_size  # Size of the newline between elements
+        self.overlap = None  # [start, end] of the previous chunk's content this chunk repeats
+        self.overlap_text = None  # The repeated text itself
+        self.overlap_size = 0  # Its size (plus separator), included in size
+    
+    def append(self, text, size=None):
+        if self.parts:
+            self.length += 1  # newline separator
+            self.size += self.separator_size
+        self.parts.append(text)
+        self.length += len(text)
+        self.size += len(text) if size is None else size
+    
+    def __len__(self):
+        return self.length
+    
+    def __str__(self):
+        return "\n".join(self.parts)
+
+
+def count_words(text: str) -> int:
+    """Length function counting whitespace-separated words."""
+    return len(text.split())
+
+
+def make_length_function(spec: str):
+    """Return the chunk length function named by spec.
+    
+    - 'chars': characters (the default)
+    - 'words': whitespace-separated words
+    - 'tiktoken:ENCODING': tokens of a tiktoken encoding, e.g. tiktoken:cl100k_base
+    - 'MODULE:FUNCTION': any function taking a string and returning its length
+    """
+    if spec == 'chars':
+        return len
+    if spec == 'words':
+        return count_words
+    kind, _, name = spec.partition(':')
+    if not name:
+        raise ValueError(f"Unknown length function '{spec}' (use chars, words, tiktoken:ENCODING or MODULE:FUNCTION)")
+    if kind == 'tiktoken':
+        try:
+            import tiktoken
+        except ImportError:
+            raise ImportError("Token-based chunk sizes need the tiktoken package: pip install tiktoken")
+        encoding = tiktoken.get_encoding(name)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    import importlib
+    return getattr(importlib.import_module(kind), name)
+
+
+# Word boundaries where an overlapping chunk may start
+WHITESPACE_PATTERN = re.compile(r'\s')
+
+# Start/end tags of the elements that can enclose a target element, and their class attribute
+BOUNDARY_TAG_PATTERN = re.compile(r'<(/?)(div|table)\b([^>]*)>', re.IGNORECASE)
+CLASS_ATTR_PATTERN = re.compile(r'''\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+
+def find_chapter_offsets(html: str) -> List[int]:
+    """Find character offsets of top-level Chapter rbox start tags in raw HTML.
+    
+    A Chapter rbox is top-level when no rbox div or footnote table is open around it,
+    so splitting the document there never cuts through an element the parser processes.
+    Open/close tracking follows html.parser: an end tag closes the most recent open tag
+    with that name, and unmatched end tags are ignored.
+    """
+    offsets = []
+    open_tags = []  # (tag name, is target element) for each open div/table
+    open_targets = 0
+    for match in BOUNDARY_TAG_PATTERN.finditer(html):
+        closing, name, attrs = match.group(1), match.group(2).lower(), match.group(3)
+        if closing:
+            for i in range(len(open_tags) - 1, -1, -1):
+                if open_tags[i][0] == name:
+                    open_targets -= sum(1 for _, is_target in open_tags[i:] if is_target)
+                    del open_tags[i:]
+                    break
+            continue
+        
+        class_match = CLASS_ATTR_PATTERN.search(attrs)
+        classes = next(group for group in class_match.groups() if group is not None).split() if class_match else []
+        if name == 'div':
+            is_target = any('rbox' in c for c in classes)
+        else:
+            is_target = 'footnote' in classes
+        
+        if is_target and open_targets == 0 and any('Chapter' in c for c in classes):
+            offsets.append(match.start())
+        
+        # A self-closing <div/> is opened and closed at once
+        if not attrs.rstrip().endswith('/'):
+            open_tags.append((name, is_target))
+            if is_target:
+                open_targets += 1
+    return offsets
+
+
+def partition_html(html: str, target_partitions: int) -> List[tuple]:
+    """Split raw HTML into (start, end) ranges of roughly equal size at top-level Chapter boundaries."""
+    target_size = len(html) / max(target_partitions, 1)
+    cuts = [0]
+    for offset in find_chapter_offsets(html):
+        if offset - cuts[-1] >= target_size:
+            cuts.append(offset)
+    cuts.append(len(html))
+    return list(zip(cuts, cuts[1:]))
+
+
+# Bump when element extraction or the chunk content hash changes, so cached block
+# records and chunk hashes from older runs are not reused
+INCREMENTAL_CACHE_VERSION = 2
+# Chunk fields left out of the content hash used to detect changed chunks
+CHUNK_HASH_IGNORED_FIELDS = ('processing_timestamp', 'chunk_number')
+# html_tags fields left out of the content hash: absolute source lines shift whenever
+# anything above them is edited
+CHUNK_HASH_IGNORED_TAG_FIELDS = ('line_number',)
+
+
+def split_top_level_blocks(html: str) -> List[tuple]:
+    """Split raw HTML into (start, end) ranges, one per top-level Chapter plus any preamble."""
+    cuts = [0] + [offset for offset in find_chapter_offsets(html) if offset > 0] + [len(html)]
+    return list(zip(cuts, cuts[1:]))
+
+
+def block_fingerprint(block_html: str, backend: str) -> str:
+    """Content address of one top-level block's extracted records."""
+    digest = hashlib.sha256(f"{INCREMENTAL_CACHE_VERSION}\0{backend}\0".encode('utf-8'))
+    digest.update(block_html.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def chunk_content_hash(chunk: Dict[str, Any]) -> str:
+    """Hash of a chunk's content and metadata, ignoring per-run fields."""
+    content = {key: value for key, value in chunk.items() if key not in CHUNK_HASH_IGNORED_FIELDS}
+    if 'html_tags' in content:
+        content['html_tags'] = [{key: value for key, value in tag.items() if key not in CHUNK_HASH_IGNORED_TAG_FIELDS}
+                                for tag in content['html_tags']]
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class StageTimer:
+    """Wall time, call count and (optionally) peak traced memory per parser stage.
+    
+    Stages nest (chunking runs inside the tree build in streaming mode, serialization
+    inside chunking); time and memory are charged to the innermost running stage only,
+    so the stage totals add up to the instrumented time. Peak memory needs
+    trace_memory, which runs tracemalloc and slows the parse down noticeably.
+    """
+    
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = {}  # name -> {'seconds', 'calls', 'peak_memory_bytes'}
+        self._running = []  # Stack of [stage stats, time it last became the innermost stage, stage name]
+        self._contexts = {}
+    
+    def stage(self, name: str) -> 'StageContext':
+        """Context manager that charges its block to stage name."""
+        context = self._contexts.get(name)
+        if context is None:
+            self.stages[name] = {'seconds': 0.0, 'calls': 0,
+                                 'peak_memory_bytes': 0 if self.trace_memory else None}
+            context = self._contexts[name] = StageContext(self, self.stages[name], name)
+        return context
+    
+    def _switch(self, now: float) -> None:
+        """Charge the innermost running stage up to now, before another stage takes over."""
+        if self._running:
+            running = self._running[-1]
+            running[0]['seconds'] += now - running[1]
+            if self.trace_memory:
+                running[0]['peak_memory_bytes'] = max(running[0]['peak_memory_bytes'],
+                                                      tracemalloc.get_traced_memory()[1])
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+    
+    def enter(self, stats: Dict[str, Any], name: str = None) -> None:
+        now = time.perf_counter()
+        self._switch(now)
+        stats['calls'] += 1
+        self._running.append([stats, now, name])
+    
+    def exit(self) -> None:
+        now = time.perf_counter()
+        self._switch(now)
+        self._running.pop()
+        if self._running:
+            self._running[-1][1] = now
+    
+    def current_stage(self) -> str:
+        """Name of the innermost running stage (safe to call from another thread)."""
+        try:
+            return self._running[-1][2]
+        except IndexError:
+            return None
+    
+    def timed(self, name: str, iterable):
+        """Iterate over iterable, charging the time spent waiting for each item to stage name."""
+        iterator = iter(iterable)
+        context = self.stage(name)
+        while True:
+            with context:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+class StageContext:
+    """Reusable `with` block for one StageTimer stage."""
+    
+    __slots__ = ('timer', 'stats', 'name')
+    
+    def __init__(self, timer: StageTimer, stats: Dict[str, Any], name: str = None):
+        self.timer = timer
+        self.stats = stats
+        self.name = name
+    
+    def __enter__(self):
+        self.timer.enter(self.stats, self.name)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.exit()
+
+
+PROGRESS_MODES = ('text', 'json', 'quiet')
+
+# Held while a progress report is written; forking waits for it, so a worker process
+# never starts with stdout/stderr locked by the reporter thread
+PROGRESS_LOCK = threading.Lock()
+_fork_hook_lock = threading.Lock()
+_fork_hook_registered = False
+
+
+def register_progress_fork_hook() -> None:
+    """Make every later fork wait for PROGRESS_LOCK (registered once, by the first reporter thread)."""
+    global _fork_hook_registered
+    with _fork_hook_lock:
+        # A second registration would acquire PROGRESS_LOCK twice and deadlock the fork
+        if _fork_hook_registered or not hasattr(os, 'register_at_fork'):
+            return
+        os.register_at_fork(before=PROGRESS_LOCK.acquire, after_in_parent=PROGRESS_LOCK.release,
+                            after_in_child=PROGRESS_LOCK.release)
+        _fork_hook_registered = True
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as H:MM:SS."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class ProgressReporter:
+    """Time-based progress reports for a parse, written by a background thread.
+    
+    The parse itself only updates counters: elements and chunks are read from the
+    parser, bytes and partitions are set by each parse mode. Every interval seconds
+    the reporter writes elements/sec and bytes/sec over the last interval, chunks
+    emitted, the innermost running stage and an ETA, so a stalled parse keeps
+    reporting, with zero rates and the stage it is stuck in. Modes:
+    - 'text': one line per report on stdout
+    - 'json': one JSON object per report on stderr ('progress' events, then 'done')
+    Status messages from the parse (element and partition counts) go through note():
+    a text line, a 'note' JSON event, or nothing when quiet.
+    - 'quiet': nothing (the library default; the command line defaults to 'text')
+    """
+    
+    def __init__(self, parser: 'SFCodeParser', mode: str = 'quiet', interval: float = CONFIG['progress_interval']):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode '{mode}' (use {', '.join(PROGRESS_MODES)})")
+        self.parser = parser
+        self.mode = mode
+        self.interval = interval
+        self.total_bytes = None  # Input size, when known
+        self.bytes_done = 0  # Input consumed so far
+        self.total_elements = None  # Elements to process, when known up front (full parses)
+        self.partitions_done = 0
+        self.total_partitions = None  # Partitions (parallel) or top-level blocks (incremental)
+        self._thread = None
+        self._stopped = threading.Event()
+    
+    def start(self) -> None:
+        self.bytes_done = 0
+        self.partitions_done = 0
+        self.start_time = time.perf_counter()
+        self._previous = (self.start_time, 0, 0)  # Time, elements and bytes at the previous report
+        self._eta_start = None  # Time and fraction done when progress first became measurable
+        if self.mode != 'quiet':
+            register_progress_fork_hook()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='parse-progress', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the reporter thread and write the final report."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.report('done')
+    
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.report('progress')
+    
+    def fraction_done(self):
+        """Share of the parse done, by elements when their total is known, else by bytes."""
+        if self.total_elements:
+            return min(self.parser.stats['total_elements_processed'] / self.total_elements, 1.0)
+        if self.total_bytes:
+            return min(self.bytes_done / self.total_bytes, 1.0)
+        return None
+    
+    def snapshot(self, event: str = 'progress') -> Dict[str, Any]:
+        """Counters, rates and ETA now; rates cover the last interval ('done': the whole parse)."""
+        now = time.perf_counter()
+        elements = self.parser.stats['total_elements_processed']
+        bytes_done = self.bytes_done
+        previous = (self.start_time, 0, 0) if event == 'done' else self._previous
+        self._previous = (now, elements, bytes_done)
+        seconds = now - previous[0]
+        
+        eta = None
+        fraction = self.fraction_done()
+        if fraction:
+            if self._eta_start is None:
+                self._eta_start = (now, fraction)
+            elif fraction > self._eta_start[1]:
+                start, start_fraction = self._eta_start
+                eta = (now - start) * (1.0 - fraction) / (fraction - start_fraction)
+        if event == 'done':
+            eta = 0.0
+        
+        return {
+            'event': event,
+            'elapsed_seconds': round(now - self.start_time, 3),
+            'stage': self.parser.timer.current_stage(),
+            'elements': elements,
+            'total_elements': self.total_elements,
+            'elements_per_sec': round((elements - previous[1]) / seconds, 1) if seconds else None,
+            'bytes': bytes_done,
+            'total_bytes': self.total_bytes,
+            'bytes_per_sec': round((bytes_done - previous[2]) / seconds) if seconds else None,
+            'partitions': self.partitions_done,
+            'total_partitions': self.total_partitions,
+            'chunks': self.parser.chunk_number - 1,
+            'eta_seconds': round(eta, 1) if eta is not None else None
+        }
+    
+    def report(self, event: str = 'progress') -> None:
+        snapshot = self.snapshot(event)
+        with PROGRESS_LOCK:
+            if self.mode == 'json':
+                print(json.dumps(snapshot), file=sys.stderr, flush=True)
+            else:
+                print(self.format(snapshot), flush=True)
+    
+    def note(self, message: str) -> None:
+        if self.mode == 'quiet':
+            return
+        with PROGRESS_LOCK:
+            if self.mode == 'json':
+                print(json.dumps({'event': 'note', 'message': message}), file=sys.stderr, flush=True)
+            else:
+                print(message, flush=True)
+    
+    @staticmethod
+    def format(snapshot: Dict[str, Any]) -> str:
+        megabyte = 1024 * 1024
+        elements = f"{snapshot['elements']:,}"
+        if snapshot['total_elements']:
+            elements += f"/{snapshot['total_elements']:,}"
+        parts = [f"{elements} elements ({snapshot['elements_per_sec'] or 0:,.0f}/s)"]
+        if snapshot['total_bytes']:
+            parts.append(f"{snapshot['bytes'] / megabyte:.1f}/{snapshot['total_bytes'] / megabyte:.1f} MB "
+                         f"({(snapshot['bytes_per_sec'] or 0) / megabyte:.2f} MB/s)")
+        if snapshot['total_partitions']:
+            parts.append(f"{snapshot['partitions']}/{snapshot['total_partitions']} partitions")
+        parts.append(f"{snapshot['chunks']:,} chunks")
+        elapsed = format_duration(snapshot['elapsed_seconds'])
+        if snapshot['event'] == 'done':
+            return f"Parsed in {elapsed}: " + ", ".join(parts)
+        eta = format_duration(snapshot['eta_seconds']) if snapshot['eta_seconds'] is not None else '?'
+        return f"[{elapsed}] {snapshot['stage'] or '-'}: " + ", ".join(parts) + f", ETA {eta}"
+
 
 class SFCodeParser:
-    def __init__(self, html_file: str, max_chunk_size: int = 2000):
+    def __init__(self, html_file: str, max_chunk_size: int = 2000, streaming: bool = False,
+                 backend: str = CONFIG['backend'], workers: int = 1, chunk_writers=None,
+                 keep_chunks: bool = True, incremental_dir: str = None, length_function=None,
+                 overlap: int = CONFIG['chunk_overlap'], reference_table: bool = False,
+                 trace_memory: bool = False, progress: str = 'quiet',
+                 progress_interval: float = CONFIG['progress_interval'], doc_uuid_function=None):
         self.html_file = html_file
-        self.max_chunk_size = max_chunk_size
+        self.max_chunk_size = max_chunk_size  # In units of the length function
+        self.length_function = length_function or make_length_function(CONFIG['length_function'])
+        if self.length_function is len:
+            self.text_size = len
+        else:
+            # Elements are measured once each; repeated texts (headers, boilerplate) hit the cache
+            self.text_size = functools.lru_cache(maxsize=CONFIG['text_size_cache_size'])(self.length_function)
+        self.separator_size = self.text_size("\n")
+        self.overlap = overlap  # Characters of overlap between chunks split for size
+        # Chunks of a section share its doc_id; compute each section's UUID once
+        self.doc_uuid = functools.lru_cache(maxsize=None)(doc_uuid_function or make_doc_uuid_function(CONFIG['doc_uuid']))
+        # Internal links recur thousands of times; resolve each distinct link string once
+        self.resolve_internal_link = functools.lru_cache(maxsize=CONFIG['link_cache_size'])(self._resolve_internal_link)
+        # With a reference table, chunks list reference_ids into it instead of reference dicts
+        self.reference_table = [] if reference_table else None
+        self.reference_ids = {}  # (hash, reference_string, record_id) -> index in reference_table
+        self.streaming = streaming  # Process elements as they close instead of building the full tree
+        self.backend = backend  # BeautifulSoup tree builder used for both full and streaming parses
+        self.workers = workers  # Worker processes for extraction; chunking always runs in this process
+        self.chunk_writers = list(chunk_writers or [])  # Sinks each chunk is written to as it is produced
+        self.keep_chunks = keep_chunks  # Also collect chunks in self.chunks (off when only streaming to writers)
+        self.incremental_dir = incremental_dir  # Block cache and manifest of the previous run; reparse changed blocks only
+        self.previous_manifest = None
+        self.chunk_manifest = {}  # chunk key -> [content hash, processing_timestamp] in incremental mode
+        self.chunk_changes = None  # Added/removed/changed chunk_ids after an incremental parse
         self.chunks = []
         self.chunk_number = 1  # Global chunk counter
         self.stats = {
@@ -34,82 +736,182 @@ class SFCodeParser:
             'tables_in_rbox': 0,
             'total_elements_processed': 0
         }
+        # Per-stage wall time, calls and peak memory; also exposed as self.stats['stages']
+        self.timer = StageTimer(trace_memory)
+        self.stats['stages'] = self.timer.stages
+        self.progress = ProgressReporter(self, progress, progress_interval)  # 'text', 'json' or 'quiet'
     
     def extract_text_from_element(self, element):
         """Extract text from an element, handling nested elements appropriately."""
-        text_content = ""
+        return self.extract_element_contents(element, collect_links=False)[0]
+    
+    def extract_element_contents(self, element, collect_links=True):
+        """Extract text, links and History data from an element in a single traversal.
+        
+        Text inclusion is decided once per subtree on the way down instead of walking
+        each node's parent chain:
+        - text is skipped when its nearest AnnotationDrawer/EdNote ancestor is an
+          AnnotationDrawer, or when it sits in a nested rbox with no EdNote in between
+        - img/a.Web URLs are skipped anywhere below an AnnotationDrawer or nested rbox
+        Once a subtree can contribute nothing, its strings and images are pruned and
+        only its tags are scanned for an EdNote, which brings text back in.
         
-        # Process all nodes in the element
-        for desc in element.descendants:
+        With collect_links, the same traversal gathers what div_links_extract_all() and
+        div_history_extract() find anywhere in the subtree: Link targets, a.Web and
+        intercodelink links with their text, images and History div text.
+        Returns (text, links, history_data); links and history_data are None without
+        collect_links.
+        """
+        text_parts = []
+        internal_links, external_links, intercode_links, image_links = [], [], [], []
+        history_texts = []  # String parts of each History div, in document order
+        # String parts of the a.Web/intercodelink/History elements currently being visited
+        open_collectors = []
+        
+        # Stack of (node, text_state, urls_blocked), children pushed in reverse for document order
+        stack = [(child, TEXT_INCLUDE, False) for child in reversed(element.contents)]
+        while stack:
+            node, text_state, urls_blocked = stack.pop()
+            
             # Handle text nodes
-            if isinstance(desc, str):
-                text = desc.strip()
-                if text:
-                    # Check parent chain to determine if we should include this text
-                    parent = desc.parent
-                    is_nested_rbox = False
-                    is_editor_note = False
-                    is_inside_annotation = False
-                    
-                    while parent and parent != element:
-                        # Skip text inside AnnotationDrawer elements
-                        if parent.name == 'annotationdrawer':
-                            is_inside_annotation = True
-                            break
-                        
-                        if hasattr(parent, 'get') and parent.get('class'):
-                            parent_classes = parent.get('class', [])
-                            if 'rbox' in parent_classes:
-                                is_nested_rbox = True
-                            if 'EdNote' in parent_classes:
-                                is_editor_note = True
-                                break
-                        parent = parent.parent
-                    
-                    # Include text if it's not in AnnotationDrawer and either not in nested rbox or is EdNote
-                    if not is_inside_annotation and (not is_nested_rbox or is_editor_note):
-                        text_content += text + " "
+            if isinstance(node, NavigableString):
+                if text_state == TEXT_INCLUDE or text_state == TEXT_EDITOR_NOTE:
+                    text = node.strip()
+                    if text:
+                        text_parts.append(text)
+                if open_collectors and type(node) in LINK_TEXT_STRING_TYPES:
+                    # Link and History text is get_text(strip=True) of the whole subtree
+                    text = node.strip()
+                    if text:
+                        for parts in open_collectors:
+                            parts.append(text)
+                continue
+            
+            if node is CLOSE_COLLECTOR:
+                # End of an a.Web/intercodelink/History subtree; the marker carries its link entry
+                parts = open_collectors.pop()
+                link_entry = text_state
+                if link_entry is not None:
+                    link_entry['text'] = "".join(parts)
+                continue
+            
+            # Collect links and History divs found anywhere in the subtree
+            collector = None
+            if collect_links:
+                collector, link_entry = self._collect_link(node, internal_links, external_links,
+                                                           intercode_links, image_links, history_texts)
+                if collector is not None:
+                    open_collectors.append(collector)
+                    stack.append((CLOSE_COLLECTOR, link_entry, None))
             
             # Handle various link types - their text content is already captured above,
             # but we also want to include URLs in the text
-            elif hasattr(desc, 'name'):
-                # Check if this element is inside a nested element we should skip
-                parent = desc.parent
-                is_inside_annotation = False
-                is_nested_rbox = False
-                
-                while parent and parent != element:
-                    if parent.name == 'annotationdrawer':
-                        is_inside_annotation = True
-                        break
-                    if hasattr(parent, 'get') and parent.get('class'):
-                        parent_classes = parent.get('class', [])
-                        if 'rbox' in parent_classes and parent != element:
-                            is_nested_rbox = True
-                            break
-                    parent = parent.parent
+            if not urls_blocked:
+                # Handle img tags
+                # Note: URLs are stored both inline (for context) and in metadata (for structured access)
+                if node.name == 'img':
+                    src = node.get('src', '')
+                    if src:
+                        text_parts.append(f"[{src}]")
                 
-                if not is_inside_annotation and not is_nested_rbox:
-                    # Handle img tags
-                    # Note: URLs are stored both inline (for context) and in metadata (for structured access)
-                    if desc.name == 'img':
-                        src = desc.get('src', '')
-                        if src:
-                            text_content += f"[{src}] "
-                    
-                    # Handle external links
-                    # URLs are kept inline so we know what part of text refers to the link
-                    elif desc.name == 'a' and 'Web' in desc.get('class', []):
-                        href = desc.get('href', '')
-                        if href:
-                            text_content += f"[{href}] "
-        
-        return text_content.strip()
+                # Handle external links
+                # URLs are kept inline so we know what part of text refers to the link
+                elif node.name == 'a' and 'Web' in node.get('class', []):
+                    href = node.get('href', '')
+                    if href:
+                        text_parts.append(f"[{href}]")
+            
+            # Work out the state this node passes down to its children
+            if node.name == 'annotationdrawer':
+                # Skip text inside AnnotationDrawer elements
+                child_text_state = TEXT_IN_ANNOTATION
+                child_urls_blocked = True
+            else:
+                child_text_state = text_state
+                child_urls_blocked = urls_blocked
+                classes = node.get('class')
+                if classes:
+                    if 'rbox' in classes:
+                        child_urls_blocked = True
+                        if text_state == TEXT_INCLUDE:
+                            child_text_state = TEXT_IN_NESTED_RBOX
+                    if 'EdNote' in classes:
+                        child_text_state = TEXT_EDITOR_NOTE
+            
+            if (child_urls_blocked and child_text_state in (TEXT_IN_ANNOTATION, TEXT_IN_NESTED_RBOX)
+                    and not open_collectors):
+                # Nothing below can be included unless an EdNote turns up - only visit tags
+                stack.extend((child, child_text_state, True) for child in reversed(node.contents)
+                             if not isinstance(child, NavigableString))
+            else:
+                stack.extend((child, child_text_state, child_urls_blocked) for child in reversed(node.contents))
+        
+        text = " ".join(text_parts)
+        if not collect_links:
+            return text, None, None
+        
+        links = {
+            'internal_links': internal_links,
+            'external_links': external_links,
+            'intercode_links': intercode_links,
+            'image_links': image_links
+        }
+        history_data = {'added_by': [], 'amended_by': [], 'see_also': []}
+        for parts in history_texts:
+            self._add_history(''.join(parts), history_data)
+        return text, links, history_data
+    
+    def _collect_link(self, node, internal_links, external_links, intercode_links, image_links, history_texts):
+        """Record node if it is a link, image or History div; see extract_element_contents.
+        
+        Returns (string parts list, link entry) when the node's subtree text is needed:
+        the entry's 'text' is filled in from the parts once the subtree has been
+        visited (None for History divs, whose parts are in history_texts).
+        """
+        name = node.name
+        if name == 'link' or name == 'Link':
+            # Internal links (Jump links within SF Municipal Code)
+            to_attr = node.get('to', '')
+            if to_attr:
+                internal_links.append(to_attr)
+        elif name == 'a':
+            # External links (ordinance PDFs, websites)
+            href = node.get('href', '')
+            if href and 'Web' in node.get('class', []):
+                entry = {'href': href, 'text': None}
+                external_links.append(entry)
+                return [], entry
+        elif name == 'intercodelink':
+            # Intercode links (references to other municipal codes)
+            destination_id = node.get('destinationid', '')
+            if destination_id:
+                entry = {'destination_id': destination_id, 'text': None}
+                intercode_links.append(entry)
+                return [], entry
+        elif name == 'img':
+            src = node.get('src', '')
+            if src:
+                image_links.append({
+                    'src': src,
+                    'alt': node.get('alt', ''),
+                    'width': node.get('width', ''),
+                    'height': node.get('height', '')
+                })
+        elif name == 'div' and 'History' in node.get('class', []):
+            parts = []
+            history_texts.append(parts)
+            return parts, None
+        return None, None
     
     def add_or_split_text(self, current_text, new_text, current_metadata, static_metadata, element, hierarchy_tags):
-        """Single place for all text addition/splitting decisions"""
+        """Single place for all text addition/splitting decisions.
+        
+        current_text is a ChunkText; it is appended to in place, or replaced by a new
+        one when the chunk is saved. Returns the ChunkText to continue with.
+        """
         if not new_text:
             return current_text
+        new_size = self.text_size(new_text)
             
         # Track HTML tag info for this element
         tag_info = {
@@ -123,8 +925,9 @@ class SFCodeParser:
         # Decision 1: If current chunk is header-only, always append
         if current_text and self.current_chunk_only_contains_header(current_text, current_metadata, hierarchy_tags):
             current_metadata['html_tags'].append(tag_info)
-            separator = "\n" if current_text else ""
-            return current_text + separator + new_text
+            current_text.append(new_text, new_size)
+            self._fit_overlap(current_text)
+            return current_text
         
         # Decision 2: If incoming element moves UP the hierarchy, create new chunk
         structural_match = self.is_structural_element(element, hierarchy_tags)
@@ -148,23 +951,32 @@ class SFCodeParser:
                 should_split = True
             
             if should_split and current_text:
-                self._save_chunk(current_text, current_metadata, static_metadata)
+                self._save_chunk(str(current_text), current_metadata, static_metadata, current_text.overlap)
                 current_metadata['chunk_index'] += 1
                 # Reset metadata for new chunk
                 self._reset_metadata_for_new_section(current_metadata, hierarchy_tags, incoming_level_index)
                 # Start new chunk with this element's text
                 current_metadata['html_tags'].append(tag_info)
-                return new_text
+                return self._new_chunk_text(new_text, new_size)
             else:
                 # Not splitting - append to current chunk
                 current_metadata['html_tags'].append(tag_info)
-                separator = "\n" if current_text else ""
-                return current_text + separator + new_text
+                current_text.append(new_text, new_size)
+                self._fit_overlap(current_text)
+                return current_text
         
         # Decision 3: If adding would exceed max size, create new chunk
-        if len(current_text + new_text) > self.max_chunk_size:
+        if current_text.size + new_size > self.max_chunk_size:
+            chunk_text = self._new_chunk_text()
             if current_text:
-                self._save_chunk(current_text, current_metadata, static_metadata)
+                saved_text = str(current_text)
+                self._save_chunk(saved_text, current_metadata, static_metadata, current_text.overlap)
+                # The new chunk takes the incoming element's id as its section_id (see
+                # _apply_element_record), which changes its doc_id; only a chunk that
+                # stays in the same section repeats the end of the one just saved
+                element_id = element.get('id', '')
+                if self.overlap and (not element_id or element_id == current_metadata.get('section_id')):
+                    self._start_with_overlap(chunk_text, saved_text, self.max_chunk_size - new_size)
                 current_metadata['chunk_index'] += 1
                 # Reset ALL accumulating metadata fields for new chunk
                 current_metadata['all_links'] = {'internal_links': [], 'external_links': [], 'intercode_links': [], 'image_links': []}
@@ -174,15 +986,18 @@ class SFCodeParser:
                 current_metadata['div_classes'] = []
                 current_metadata['html_tags'] = []
             current_metadata['html_tags'].append(tag_info)
-            return new_text
+            chunk_text.append(new_text, new_size)
+            self._fit_overlap(chunk_text)
+            return chunk_text
         
         # Decision 4: Just append to current chunk
         current_metadata['html_tags'].append(tag_info)
-        separator = "\n" if current_text else ""
-        return current_text + separator + new_text if current_text else new_text
+        current_text.append(new_text, new_size)
+        self._fit_overlap(current_text)
+        return current_text
 
     def add_text_to_current_chunk(self, current_text, new_text, current_metadata, static_metadata, element=None):
-        """Add text to current chunk without size limits."""
+        """Add text to the current ChunkText without size limits."""
         if not new_text:
             return current_text
             
@@ -197,15 +1012,71 @@ class SFCodeParser:
             }
             current_metadata['html_tags'].append(tag_info)
             
-        # Always add a newline between elements to preserve structure
-        separator = "\n" if current_text else ""
-            
-        combined_text = current_text + separator + new_text if current_text else new_text
-        return combined_text
+        # ChunkText puts a newline between elements to preserve structure
+        current_text.append(new_text, self.text_size(new_text))
+        return current_text
     
     def should_create_new_chunk(self, current_text, new_text):
         """Determine if adding text would exceed chunk size."""
-        return len(current_text + new_text) > self.max_chunk_size
+        return current_text.size + self.text_size(new_text) > self.max_chunk_size
+    
+    def _new_chunk_text(self, text: str = "", size: int = None) -> ChunkText:
+        """Start the ChunkText of a new chunk, optionally with its first element."""
+        chunk_text = ChunkText(self.separator_size)
+        if text:
+            chunk_text.append(text, size)
+        return chunk_text
+    
+    def _start_with_overlap(self, chunk_text: ChunkText, previous_text: str, budget: int) -> None:
+        """Make an empty ChunkText start with the tail of the chunk just saved.
+        
+        The tail (about self.overlap characters, starting at a word boundary) is not
+        copied into the new chunk's content; the chunk records it as an 'overlap'
+        [start, end] range into the previous chunk's content, which
+        chunk_store.resolve_content() prepends when reading. It counts toward the new
+        chunk's size, so it is shortened until it and its separator fit in budget
+        (what the chunk's first element leaves of max_chunk_size).
+        """
+        start = self._overlap_start(previous_text, max(0, len(previous_text) - min(self.overlap, budget)), budget)
+        if start is not None:
+            chunk_text.overlap = [start, len(previous_text)]
+            self._set_overlap_text(chunk_text, previous_text[start:])
+    
+    def _overlap_start(self, text: str, start: int, budget: int):
+        """First word start at or after start whose tail of text, plus a separator, fits in budget (or None)."""
+        while start < len(text):
+            if start > 0 and not text[start - 1].isspace():
+                # Don't start mid-word
+                boundary = WHITESPACE_PATTERN.search(text, start)
+                start = boundary.start() if boundary else len(text)
+            while start < len(text) and text[start].isspace():
+                start += 1
+            if start == len(text):
+                return None
+            if self.text_size(text[start:]) + self.separator_size <= budget:
+                return start
+            start += 1
+        return None
+    
+    def _set_overlap_text(self, chunk_text: ChunkText, overlap_text: str) -> None:
+        size = self.text_size(overlap_text) + self.separator_size
+        chunk_text.size += size - chunk_text.overlap_size
+        chunk_text.overlap_text = overlap_text
+        chunk_text.overlap_size = size
+    
+    def _fit_overlap(self, chunk_text: ChunkText) -> None:
+        """Shorten (or drop) the overlap of a chunk whose last append took it past max_chunk_size."""
+        if not chunk_text.overlap or chunk_text.size <= self.max_chunk_size:
+            return
+        budget = self.max_chunk_size - (chunk_text.size - chunk_text.overlap_size)
+        start = self._overlap_start(chunk_text.overlap_text, 0, budget)
+        if start is None:
+            chunk_text.size -= chunk_text.overlap_size
+            chunk_text.overlap = chunk_text.overlap_text = None
+            chunk_text.overlap_size = 0
+        else:
+            chunk_text.overlap[0] += start
+            self._set_overlap_text(chunk_text, chunk_text.overlap_text[start:])
     
     def extract_inner_div_classes(self, element):
         """Extract semantic class information from inner divs."""
@@ -224,11 +1095,8 @@ class SFCodeParser:
         
         return div_classes
     
-    def process_metadata_links(self, element, current_metadata):
-        """Extract all links and history from element and update metadata."""
-        # Extract all types of links
-        all_links = self.div_links_extract_all(element)
-        
+    def process_metadata_links(self, all_links, history_data, current_metadata):
+        """Add an element's extracted links and history to metadata."""
         # Update link metadata
         current_metadata['all_links']['internal_links'].extend(all_links['internal_links'])
         current_metadata['all_links']['external_links'].extend(all_links['external_links'])
@@ -238,8 +1106,7 @@ class SFCodeParser:
         # Process internal links to extract references
         self._process_internal_links(all_links['internal_links'], current_metadata)
         
-        # Extract and store history data if present
-        history_data = self.div_history_extract(element)
+        # Store history data if present
         if any(history_data[key] for key in history_data):
             current_metadata['history_data'] = history_data
     
@@ -263,48 +1130,28 @@ class SFCodeParser:
         header_patterns = ['AMENDMENT HISTORY']
         
         total_content_length = sum(tag.get('text_length', 0) for tag in html_tags)
+        if total_content_length >= 100:
+            # Too long to be header-only whatever its elements are
+            return False
         
-        # Check if chunk is short and matches header patterns
-        if total_content_length < 100:
-            current_text_clean = current_text.strip().upper()
-            if current_text_clean in header_patterns:
-                return True
-            
-            # Check for chapter/appendix patterns with matching HTML tags
-            has_chapter_tag = any('Chapter' in str(tag.get('classes', [])) for tag in html_tags)
-            if has_chapter_tag and (current_text_clean.startswith('CHAPTER ') or current_text_clean.startswith('APPENDIX ')):
-                return True
-            
-            # Check for year ordinance patterns
-            has_year_tag = any('level-Year' in str(tag.get('classes', [])) for tag in html_tags)
-            if has_year_tag and 'ORDINANCES' in current_text_clean:
-                return True
-        
-        has_structural = False
-        non_structural_length = 0
-        
-        # Check each element in current chunk
-        for tag_info in html_tags:
-            tag_classes = tag_info.get('classes', [])
-            text_length = tag_info.get('text_length', 0)
-            
-            # Check if this element is structural/header
-            is_structural = False
-            for hier in hierarchy_tags:
-                tag_keyword = hier['tag']
-                if any(tag_keyword in cls for cls in tag_classes):
-                    is_structural = True
-                    has_structural = True
-                    break
-            
-            # If not structural, add to content length
-            if not is_structural:
-                non_structural_length += text_length
+        # Check if chunk matches header patterns
+        current_text_clean = str(current_text).strip().upper()
+        if current_text_clean in header_patterns:
+            return True
+        
+        # Check for chapter/appendix patterns with matching HTML tags
+        has_chapter_tag = any('Chapter' in str(tag.get('classes', [])) for tag in html_tags)
+        if has_chapter_tag and (current_text_clean.startswith('CHAPTER ') or current_text_clean.startswith('APPENDIX ')):
+            return True
+        
+        # Check for year ordinance patterns
+        has_year_tag = any('level-Year' in str(tag.get('classes', [])) for tag in html_tags)
+        if has_year_tag and 'ORDINANCES' in current_text_clean:
+            return True
         
-        # Consider header-only if:
-        # 1. Has structural elements AND chunk is short overall (header without much content)
-        # 2. OR matches specific header patterns  
-        return has_structural and total_content_length < 100
+        # A short chunk with any structural element (Chapter, Article, Section...) is a header
+        return any(any(hier['tag'] in cls for hier in hierarchy_tags for cls in tag_info.get('classes', []))
+                   for tag_info in html_tags)
     
     def classify_element(self, element):
         """Classify an element by its type for processing."""
@@ -350,17 +1197,18 @@ class SFCodeParser:
         
         return 'skip'
     
-    def process_new_ordinance_links(self, element, text_content, current_metadata):
-        """Extract links from New Ordinance Notice elements."""
-        class_name = ' '.join(element.get('class', []))
-        if 'NewOrd' in class_name or 'new ordinance' in text_content.lower():
-            all_links = self.div_links_extract_all(element)
-            # Add new ordinance related links to metadata
-            for link in all_links['internal_links']:
-                if 'NewOrd' in link or 'new' in link.lower():
-                    current_metadata['new_ordinance_links'].append(link)
-            current_metadata['all_links']['internal_links'].extend(all_links['internal_links'])
-            current_metadata['all_links']['external_links'].extend(all_links['external_links'])
+    def is_new_ordinance_notice(self, class_name, text_content):
+        """Check if an element is a New Ordinance Notice."""
+        return 'NewOrd' in class_name or 'new ordinance' in text_content.lower()
+    
+    def process_new_ordinance_links(self, all_links, current_metadata):
+        """Add links extracted from a New Ordinance Notice element to metadata."""
+        # Add new ordinance related links to metadata
+        for link in all_links['internal_links']:
+            if 'NewOrd' in link or 'new' in link.lower():
+                current_metadata['new_ordinance_links'].append(link)
+        current_metadata['all_links']['internal_links'].extend(all_links['internal_links'])
+        current_metadata['all_links']['external_links'].extend(all_links['external_links'])
     
     def process_footnote(self, footnote_element):
         """Extract text from a footnote table element."""
@@ -398,30 +1246,233 @@ class SFCodeParser:
     
     def parse(self) -> List[Dict[str, Any]]:
         """Parse the HTML file and return chunked data with metadata."""
+        if self.timer.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        parse_start_time = time.perf_counter()
         
-        import time
-        parse_start_time = time.time()
-        print(f"Parse started at time {parse_start_time}")
-        
-        with open(self.html_file, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f.read(), 'html.parser')
-        
-        # Function to identify elements we want to process
-        def has_target_class(tag):
-            if tag.name == 'div':
-                classes = tag.get('class', [])
-                return any('rbox' in c for c in classes)
-            elif tag.name == 'table':
-                classes = tag.get('class', [])
-                return 'footnote' in classes
-            # Note: Footnote marker spans are already captured inside rbox text
-            # Note: Only 14 <p> tags exist in the document, mostly empty
-            return False
+        state = self._new_parse_state()
+        self.progress.total_bytes = os.path.getsize(self.html_file)
+        self.progress.start()
+        try:
+            if self.incremental_dir:
+                self._parse_incremental(state)
+            elif self.workers > 1:
+                self._parse_parallel(state)
+            elif self.streaming:
+                self._parse_streaming(state)
+            else:
+                self._parse_full(state)
+            
+            chunks = self._finish_parse(state)
+            if self.incremental_dir:
+                with self.timer.stage('block_cache'):
+                    self._save_incremental_manifest()
+        finally:
+            self.progress.stop()
+        self.stats['parse_seconds'] = time.perf_counter() - parse_start_time
+        return chunks
+    
+    def _parse_full(self, state: Dict[str, Any]) -> None:
+        """Build the whole BeautifulSoup tree, then process its elements in document order."""
+        with self.timer.stage('read'):
+            with open(self.html_file, 'r', encoding='utf-8') as f:
+                html = f.read()
+        with self.timer.stage('tree_build'):
+            soup = BeautifulSoup(html, self.backend)
+        del html
         
         # Find all rbox divs and footnote tables in document order
-        elements = soup.find_all(has_target_class)
-        print(f"Found {len(elements)} elements (rbox divs + footnote tables + standalone p/span)")
+        with self.timer.stage('find_elements'):
+            elements = soup.find_all(has_target_class)
+        self.progress.note(f"Found {len(elements)} elements (rbox divs + footnote tables + standalone p/span)")
+        self.progress.total_elements = len(elements)
+        self.progress.bytes_done = self.progress.total_bytes
+        
+        for element in elements:
+            self._process_element(element, state)
+    
+    def _parse_streaming(self, state: Dict[str, Any]) -> None:
+        """Process each top-level rbox/footnote subtree as soon as it closes, then drop it.
+        
+        Nested target elements are processed right after their top-level ancestor,
+        which is the same document order find_all() yields in a full parse.
+        """
+        def on_element_closed(root):
+            with self.timer.stage('find_elements'):
+                elements = [root] + root.find_all(has_target_class)
+            for element in elements:
+                self._process_element(element, state)
+        
+        soup = StreamingSoup(on_element_closed, self.backend)
+        # Reading is interleaved with tree building here, so both count as tree_build
+        with self.timer.stage('tree_build'):
+            with open(self.html_file, 'r', encoding='utf-8') as f:
+                soup.feed_file(f, CONFIG['stream_block_size'], self.progress)
+        self.progress.note(f"Streamed {self.stats['total_elements_processed']} elements (rbox divs + footnote tables)")
+    
+    def _parse_parallel(self, state: Dict[str, Any]) -> None:
+        """Extract elements in a process pool, partitioned at top-level Chapter boundaries.
+        
+        Workers build the tree and extract every element of their partition; the
+        results come back in document order and are chunked here, so chunk_numbers
+        are global and the output matches a serial parse.
+        """
+        with self.timer.stage('read'):
+            with open(self.html_file, 'r', encoding='utf-8') as f:
+                html = f.read()
+        
+        with self.timer.stage('partition'):
+            ranges = partition_html(html, self.workers * CONFIG['partitions_per_worker'])
+        self.progress.note(f"Split document into {len(ranges)} partitions for {self.workers} workers")
+        self.progress.total_partitions = len(ranges)
+        
+        def tasks():
+            line_offset = 0
+            previous_start = 0
+            for start, end in ranges:
+                # html.parser numbers lines from 1 within each partition
+                line_offset += html.count('\n', previous_start, start)
+                previous_start = start
+                yield html[start:end], line_offset, self.backend
+        
+        # Tree building and extraction run in the workers; here they show up as time
+        # spent waiting for partition results
+        chunking = self.timer.stage('chunking')
+        with multiprocessing.Pool(self.workers) as pool:
+            results = self.timer.timed('extract', pool.imap(parse_partition, tasks()))
+            for i, records in enumerate(results):
+                self.progress.partitions_done = i + 1
+                # Characters through the end of the partition, scaled to the file's bytes
+                self.progress.bytes_done = self.progress.total_bytes * ranges[i][1] // max(len(html), 1)
+                for record in records:
+                    with chunking:
+                        self._apply_element_record(record, state)
+    
+    def _parse_incremental(self, state: Dict[str, Any]) -> None:
+        """Reuse cached records for top-level blocks whose HTML is unchanged since the last run.
+        
+        Each top-level Chapter block is fingerprinted; blocks missing from the cache are
+        extracted (in worker processes if workers > 1) and cached with block-relative line
+        numbers. Chunking then runs over every block's records in document order, so the
+        output matches a full parse and doc_id/uuid stay stable for unchanged content.
+        """
+        with self.timer.stage('read'):
+            with open(self.html_file, 'r', encoding='utf-8') as f:
+                html = f.read()
+        
+        manifest_path = os.path.join(self.incremental_dir, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == INCREMENTAL_CACHE_VERSION:
+                self.previous_manifest = manifest
+        blocks_dir = os.path.join(self.incremental_dir, 'blocks')
+        os.makedirs(blocks_dir, exist_ok=True)
+        
+        blocks = []  # (fingerprint, start, end, line offset)
+        line_offset = 0
+        previous_start = 0
+        with self.timer.stage('partition'):
+            for start, end in split_top_level_blocks(html):
+                line_offset += html.count('\n', previous_start, start)
+                previous_start = start
+                blocks.append((block_fingerprint(html[start:end], self.backend), start, end, line_offset))
+        self.block_fingerprints = [block[0] for block in blocks]
+        
+        def block_path(fingerprint):
+            return os.path.join(blocks_dir, f'{fingerprint}.pkl')
+        
+        changed = [block for block in blocks if not os.path.exists(block_path(block[0]))]
+        self.progress.note(f"Incremental parse: {len(blocks)} top-level blocks, {len(changed)} to reparse")
+        # Progress counts the changed blocks while extracting, then every block while chunking
+        self.progress.total_partitions = len(changed)
+        
+        # Extract changed blocks with block-relative line numbers and cache them
+        tasks = ((html[start:end], 0, self.backend) for _, start, end, _ in changed)
+        # Changed blocks are parsed whole by parse_partition, so their tree build and
+        # extraction are both counted as extract
+        extracted = []
+        with self.timer.stage('extract'):
+            if self.workers > 1 and len(changed) > 1:
+                with multiprocessing.Pool(self.workers) as pool:
+                    for records in pool.imap(parse_partition, tasks):
+                        extracted.append(records)
+                        self.progress.partitions_done = len(extracted)
+            else:
+                for task in tasks:
+                    extracted.append(parse_partition(task))
+                    self.progress.partitions_done = len(extracted)
+        with self.timer.stage('block_cache'):
+            for (fingerprint, _, _, _), records in zip(changed, extracted):
+                temp_path = f'{block_path(fingerprint)}.{os.getpid()}.tmp'
+                with open(temp_path, 'wb') as f:
+                    pickle.dump([record.__dict__ for record in records], f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, block_path(fingerprint))
+        
+        block_cache = self.timer.stage('block_cache')
+        chunking = self.timer.stage('chunking')
+        self.progress.total_partitions = len(blocks)
+        for i, (fingerprint, _, end, line_offset) in enumerate(blocks):
+            self.progress.partitions_done = i + 1
+            self.progress.bytes_done = self.progress.total_bytes * end // max(len(html), 1)
+            with block_cache:
+                with open(block_path(fingerprint), 'rb') as f:
+                    records = [ElementRecord.from_dict(data) for data in pickle.load(f)]
+            for record in records:
+                if record.sourceline is not None:
+                    record.sourceline += line_offset
+                with chunking:
+                    self._apply_element_record(record, state)
+        
+        # Blocks no longer in the document are not needed by the next run
+        keep = {block_path(fingerprint) for fingerprint in self.block_fingerprints}
+        for name in os.listdir(blocks_dir):
+            path = os.path.join(blocks_dir, name)
+            if path not in keep:
+                os.remove(path)
+    
+    def _track_chunk(self, chunk: Dict[str, Any]) -> None:
+        """Record a chunk in the incremental manifest, keeping the timestamp of unchanged chunks."""
+        key = chunk['chunk_id']
+        # chunk_ids can repeat (e.g. sections without an id); number the repeats
+        occurrence = 2
+        while key in self.chunk_manifest:
+            key = f"{chunk['chunk_id']}#{occurrence}"
+            occurrence += 1
+        content_hash = chunk_content_hash(chunk)
+        previous_chunks = self.previous_manifest['chunks'] if self.previous_manifest else {}
+        previous = previous_chunks.get(key)
+        if previous and previous[0] == content_hash:
+            chunk['processing_timestamp'] = previous[1]
+        self.chunk_manifest[key] = [content_hash, chunk['processing_timestamp']]
+    
+    def _save_incremental_manifest(self) -> None:
+        """Write the manifest for the next incremental run and report changed chunk_ids."""
+        previous_chunks = self.previous_manifest['chunks'] if self.previous_manifest else {}
+        self.chunk_changes = {
+            'added': [key for key in self.chunk_manifest if key not in previous_chunks],
+            'removed': [key for key in previous_chunks if key not in self.chunk_manifest],
+            'changed': [key for key, (content_hash, _) in self.chunk_manifest.items()
+                        if key in previous_chunks and previous_chunks[key][0] != content_hash]
+        }
+        manifest = {
+            'version': INCREMENTAL_CACHE_VERSION,
+            'input_file': self.html_file,
+            'backend': self.backend,
+            'blocks': self.block_fingerprints,
+            'chunks': self.chunk_manifest
+        }
+        with open(os.path.join(self.incremental_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        with open(os.path.join(self.incremental_dir, 'changes.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.chunk_changes, f, indent=2)
         
+        print(f"\nIncremental changes since previous run: {len(self.chunk_changes['added'])} added, "
+              f"{len(self.chunk_changes['removed'])} removed, {len(self.chunk_changes['changed'])} changed chunks")
+        print(f"Saved chunk_id changes to {os.path.join(self.incremental_dir, 'changes.json')}")
+    
+    def _new_parse_state(self) -> Dict[str, Any]:
+        """Create the chunking state carried from one element to the next."""
         # Hard-coded metadata fields
         static_metadata = {
             'source_url': 'https://codelibrary.amlegal.com/codes/san_francisco/latest/overview',
@@ -429,7 +1480,6 @@ class SFCodeParser:
             'city': 'San Francisco'
         }
         
-        current_text = ""
         current_metadata = {
             'chapter': None,
             'article': None, 
@@ -449,128 +1499,159 @@ class SFCodeParser:
             'html_tags': []  # Track HTML tags, text lengths, and line numbers
         }
         
-        # Track unhandled text for debugging
-        unhandled_text = []
-        
-        # Define hierarchy tags with extraction rules
-        hierarchy_tags = [
-            {
-                'tag': 'Chapter', 
-                'type': 'Chapter', 
-                'fields': ['chapter'],
-                'extractors': {}
-            },
-            {
-                'tag': 'Article', 
-                'type': 'Article', 
-                'fields': ['article', 'article_number', 'article_title'],
-                'extractors': {
-                    'article_number': r'^(ARTICLE\s+)?(\d+[A-Z]?-?\d*\.?|\b[IVXLCDM]+\b)[:.]?\s+(.+)',
-                    'article_title': lambda match: match.group(3) if match else None
-                }
-            },
-            {
-                'tag': 'Division', 
-                'type': 'Division', 
-                'fields': ['division'],
-                'extractors': {}
-            },
-            {
-                'tag': 'Section', 
-                'type': 'Section', 
-                'fields': ['section_title', 'section_number'],
-                'extractors': {
-                    'section_number': r'SEC\.\s*(\d+\.?\d*)'
-                }
-            },
-            {
-                'tag': 'Subsection', 
-                'type': 'Subsection', 
-                'fields': ['subsection'],
-                'extractors': {}
-            }
-        ]
+        return {
+            'current_text': self._new_chunk_text(),
+            'current_metadata': current_metadata,
+            'static_metadata': static_metadata,
+            'hierarchy_tags': HIERARCHY_TAGS,
+            'unhandled_text': []  # Track unhandled text for debugging
+        }
+    
+    def _process_element(self, element, state: Dict[str, Any]) -> None:
+        """Extract one rbox/footnote element and feed its text into the chunking logic."""
+        with self.timer.stage('extract'):
+            record = self._extract_element_record(element)
+        with self.timer.stage('chunking'):
+            self._apply_element_record(record, state)
+    
+    def _extract_element_record(self, element, line_offset: int = 0) -> 'ElementRecord':
+        """Extract everything the chunking step needs from one element.
         
-        for i, element in enumerate(elements):
-            if i % 100 == 0:
-                print(f"Processing element {i}/{len(elements)}")
-            
-            self.stats['total_elements_processed'] += 1
+        This is the expensive, order-independent half of element processing; it only
+        looks inside the element, so it can run in a worker process.
+        """
+        class_name = ' '.join(element.get('class', []))
+        sourceline = getattr(element, 'sourceline', None)
+        if sourceline is not None:
+            sourceline += line_offset
+        record = ElementRecord(element.name,
+                               {key: element.get(key) for key in ('class', 'id') if element.has_attr(key)},
+                               sourceline)
+        
+        # Check if this is any structural element
+        structural_match = self.is_structural_element(element, HIERARCHY_TAGS)
+        
+        # Extract text, plus links and history for Normal-Level elements, in one traversal
+        collect_links = not structural_match and 'Normal-Level' in class_name
+        text_content, links, history = self.extract_element_contents(element, collect_links)
+        
+        # Extract element metadata based on type
+        if structural_match:
+            # Extract data using the configuration
+            record.structural_data = self._extract_structural_data(element, structural_match)
                 
-            class_name = ' '.join(element.get('class', []))
-            element_id = element.get('id', '')
+        elif 'Normal-Level' in class_name:
+            # Extract the inner div's class for semantic information
+            inner_div = element.find('div', recursive=False)
+            if inner_div and inner_div.find('annotationdrawer'):
+                # Skip AnnotationDrawer and get the actual content div
+                content_divs = element.find_all('div', recursive=False)
+                if len(content_divs) > 1:
+                    inner_div = content_divs[1]
             
-            # Extract text from element
-            text_content = self.extract_text_from_element(element)
+            if inner_div and inner_div.get('class'):
+                record.div_class = ' '.join(inner_div.get('class', []))
             
-            # Check if this is any structural element
-            structural_match = self.is_structural_element(element, hierarchy_tags)
+            # All types of links and history from this element
+            record.links = links
+            record.history = history
             
-            # Process element metadata based on type
-            if structural_match:
-                # Extract data using the configuration
-                extracted_data = self._extract_structural_data(element, structural_match)
-                # Update current metadata with extracted data
-                current_metadata.update(extracted_data)
-                # Set hash based on the anchor found using data-driven approach
-                anchor_field = f"{structural_match['type'].lower()}_anchor"
-                if anchor_field in extracted_data:
-                    current_metadata['hash'] = f"#{extracted_data[anchor_field]}"
-                    
-            elif 'Normal-Level' in class_name:
-                # Extract the inner div's class for semantic information
-                inner_div = element.find('div', recursive=False)
-                if inner_div and inner_div.find('annotationdrawer'):
-                    # Skip AnnotationDrawer and get the actual content div
-                    content_divs = element.find_all('div', recursive=False)
-                    if len(content_divs) > 1:
-                        inner_div = content_divs[1]
-                
-                if inner_div and inner_div.get('class'):
-                    div_class = ' '.join(inner_div.get('class', []))
-                    if div_class and div_class not in current_metadata['div_classes']:
-                        current_metadata['div_classes'].append(div_class)
-                
-                # Extract and accumulate all types of links and metadata from this element
-                self.process_metadata_links(element, current_metadata)
+        elif element.name == 'table' and 'footnote' in class_name:
+            # Handle footnote tables
+            record.is_footnote = True
+            footnote_data = self.process_footnote(element)
+            if footnote_data:
+                text_content = f"\n\n[Footnote {footnote_data['marker']}] {footnote_data['text']}"
+        
+        record.text = text_content
+        
+        # Extract links if this is a New Ordinance Notice
+        if text_content and record.get('id', '') and self.is_new_ordinance_notice(class_name, text_content):
+            record.new_ordinance_links = links if links is not None else self.div_links_extract_all(element)
+        
+        return record
+    
+    def _apply_element_record(self, record: 'ElementRecord', state: Dict[str, Any]) -> None:
+        """Feed one extracted element into the chunking logic.
+        
+        This is the cheap, order-dependent half of element processing; records must be
+        applied in document order.
+        """
+        current_metadata = state['current_metadata']
+        hierarchy_tags = state['hierarchy_tags']
+        
+        self.stats['total_elements_processed'] += 1
+            
+        class_name = ' '.join(record.get('class', []))
+        element_id = record.get('id', '')
+        text_content = record.text
+        
+        # Check if this is any structural element
+        structural_match = self.is_structural_element(record, hierarchy_tags)
+        
+        # Process element metadata based on type
+        if structural_match:
+            extracted_data = record.structural_data
+            # Update current metadata with extracted data
+            current_metadata.update(extracted_data)
+            # Set hash based on the anchor found using data-driven approach
+            anchor_field = f"{structural_match['type'].lower()}_anchor"
+            if anchor_field in extracted_data:
+                current_metadata['hash'] = f"#{extracted_data[anchor_field]}"
                 
-            elif element.name == 'table' and 'footnote' in class_name:
-                # Handle footnote tables
-                self.stats['footnote_tables'] += 1
-                print(f"  Found footnote table with marker")
-                footnote_data = self.process_footnote(element)
-                if footnote_data:
-                    text_content = f"\n\n[Footnote {footnote_data['marker']}] {footnote_data['text']}"
+        elif 'Normal-Level' in class_name:
+            div_class = record.div_class
+            if div_class and div_class not in current_metadata['div_classes']:
+                current_metadata['div_classes'].append(div_class)
+            
+            # Accumulate all types of links and metadata from this element
+            self.process_metadata_links(record.links, record.history, current_metadata)
             
-            # Single decision point for all text addition/splitting
-            if text_content:
-                current_text = self.add_or_split_text(current_text, text_content, current_metadata, static_metadata, element, hierarchy_tags)
+        elif record.is_footnote:
+            self.stats['footnote_tables'] += 1  # Reported in the parser statistics
+        
+        # Single decision point for all text addition/splitting
+        if text_content:
+            state['current_text'] = self.add_or_split_text(state['current_text'], text_content, current_metadata,
+                                                           state['static_metadata'], record, hierarchy_tags)
+            
+            # Update section_id from element id if applicable
+            if element_id:
+                current_metadata['section_id'] = element_id
                 
-                # Update section_id from element id if applicable
-                if element_id:
-                    current_metadata['section_id'] = element_id
-                    
-                    # Extract links if this is a New Ordinance Notice
-                    self.process_new_ordinance_links(element, text_content, current_metadata)
-                    
-                    # Track for debugging (optional - can remove later)
-                    unhandled_text.append({
-                        'class': class_name,
-                        'text': text_content[:200] + '...' if len(text_content) > 200 else text_content,
-                        'full_length': len(text_content),
-                        'status': 'included'
-                    })
+                # Add links if this is a New Ordinance Notice
+                if record.new_ordinance_links is not None:
+                    self.process_new_ordinance_links(record.new_ordinance_links, current_metadata)
+                
+                # Track for debugging (optional - can remove later)
+                state['unhandled_text'].append({
+                    'class': class_name,
+                    'text': text_content[:200] + '...' if len(text_content) > 200 else text_content,
+                    'full_length': len(text_content),
+                    'status': 'included'
+                })
+    
+    def _finish_parse(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Save the final chunk and report parser statistics."""
+        unhandled_text = state['unhandled_text']
         
         # Save final chunk
-        if current_text:
-            self._save_chunk(current_text, current_metadata, static_metadata)
+        if state['current_text']:
+            with self.timer.stage('chunking'):
+                self._save_chunk(str(state['current_text']), state['current_metadata'], state['static_metadata'],
+                                 state['current_text'].overlap)
+        self.progress.stop()
             
-        import time
-        print(f"Line 594 created {len(self.chunks)} chunks at time {time.time()}")
         print(f"\nParser Statistics:")
         print(f"  Total elements processed: {self.stats['total_elements_processed']}")
         print(f"  Footnote tables found: {self.stats['footnote_tables']}")
         print(f"  Tables are captured within rbox element content")
+        link_cache = self.resolve_internal_link.cache_info()
+        self.stats['link_cache_hits'] = link_cache.hits
+        self.stats['link_cache_misses'] = link_cache.misses
+        print(f"  Internal link cache: {link_cache.hits} hits, {link_cache.misses} misses")
+        if self.reference_table is not None:
+            print(f"  Reference table: {len(self.reference_table)} distinct references")
         
         # Save unhandled text for analysis
         if unhandled_text:
@@ -591,22 +1672,50 @@ class SFCodeParser:
         return self.chunks
     
     def _process_internal_links(self, internal_links: List[str], metadata: Dict[str, Any]) -> None:
-        """Process internal links and add them to metadata references."""
+        """Process internal links and add them to metadata references.
+        
+        With a reference table, references are added as their integer IDs in it.
+        """
         for link in internal_links:
-            # Parse the full link information
-            link_info = self.parse_internal_link(link)
-            
-            # Get the human-readable reference string
-            ref_string = self.parse_internal_hierarchy_ref(link)
-            
-            # Store the parsed reference
-            if link_info['hash']:
-                reference = {
-                    'hash': link_info['hash'],
-                    'reference_string': ref_string if ref_string else link_info['record_id'],
-                    'record_id': link_info['record_id']
-                }
-                metadata['references'].append(reference)
+            reference = self.resolve_internal_link(link)
+            if reference is None:
+                continue
+            if self.reference_table is not None:
+                reference = self._reference_id(reference)
+            metadata['references'].append(reference)
+    
+    def _resolve_internal_link(self, link: str):
+        """Build the reference dict for an internal link, or None if it has no hash.
+        
+        Called through self.resolve_internal_link, which memoizes it per link string;
+        the returned dict is shared by every chunk citing the link.
+        """
+        # Parse the full link information
+        link_info = self.parse_internal_link(link)
+        if not link_info['hash']:
+            return None
+        
+        # Get the human-readable reference string
+        ref_string = self.parse_internal_hierarchy_ref(link)
+        return {
+            'hash': link_info['hash'],
+            'reference_string': ref_string if ref_string else link_info['record_id'],
+            'record_id': link_info['record_id']
+        }
+    
+    def _reference_id(self, reference: Dict[str, Any]) -> int:
+        """ID of a reference in the reference table, adding it on first use."""
+        key = (reference['hash'], reference['reference_string'], reference['record_id'])
+        reference_id = self.reference_ids.get(key)
+        if reference_id is None:
+            reference_id = self.reference_ids[key] = len(self.reference_table)
+            self.reference_table.append(reference)
+        return reference_id
+    
+    def save_reference_table(self, output_file: str):
+        """Save the reference table: a JSON array whose indexes are the chunks' reference_ids."""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.reference_table, f, indent=2, ensure_ascii=False)
     
     def _extract_structural_data(self, element, hier_config):
         """Extract data from a structural element using configuration rules."""
@@ -626,26 +1735,21 @@ class SFCodeParser:
             return data
             
         # Extract text content (use same approach as main parser)
-        element_text = ""
-        for desc in content_div.descendants:
-            if isinstance(desc, str):
-                text = desc.strip()
+        # AnnotationDrawer and anchor subtrees are skipped whole rather than checked per text node
+        text_parts = []
+        stack = list(reversed(content_div.contents))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NavigableString):
+                text = node.strip()
                 if text:
-                    # Check if this text is inside a nested element we should skip
-                    parent = desc.parent
-                    skip = False
-                    while parent and parent != content_div:
-                        if hasattr(parent, 'name') and parent.name in ['annotationdrawer', 'a']:
-                            skip = True
-                            break
-                        parent = parent.parent
-                    
-                    if not skip:
-                        element_text += text + " "
-        element_text = element_text.strip()
+                    text_parts.append(text)
+            elif node.name not in ('annotationdrawer', 'a'):
+                stack.extend(reversed(node.contents))
+        element_text = " ".join(text_parts)
         
         # Extract anchor if present
-        anchor_element = content_div.find('a', {'name': re.compile(r'JD_.*')})
+        anchor_element = content_div.find('a', {'name': JD_ANCHOR_PATTERN})
         if anchor_element:
             anchor_field = f"{hier_config['type'].lower()}_anchor"
             data[anchor_field] = anchor_element.get('name', '')
@@ -659,7 +1763,7 @@ class SFCodeParser:
             for field, extractor in hier_config['extractors'].items():
                 if isinstance(extractor, str):
                     # It's a regex pattern
-                    match = re.search(extractor, element_text, re.IGNORECASE)
+                    match = extractor_pattern(extractor).search(element_text)
                     if match:
                         if field == 'section_number':
                             data[field] = match.group(1)
@@ -689,11 +1793,11 @@ class SFCodeParser:
     def parse_internal_link(self, link_str):
         """Parse internal link to extract all components."""
         # Extract pathname
-        pathname_match = re.search(r"pathname: '([^']+)'", link_str)
+        pathname_match = LINK_PATHNAME_PATTERN.search(link_str)
         pathname = pathname_match.group(1) if pathname_match else None
         
         # Extract hash
-        hash_match = re.search(r"hash: '(#[^']+)'", link_str)
+        hash_match = LINK_HASH_PATTERN.search(link_str)
         hash_val = hash_match.group(1) if hash_match else None
         
         # Extract the record ID from pathname (e.g., 0-0-0-18 from the pathname)
@@ -713,7 +1817,7 @@ class SFCodeParser:
     def parse_internal_hierarchy_ref(self, link_str):
         """Parse internal link to extract hierarchy reference."""
         # Extract hash from link string
-        hash_match = re.search(r"hash: '#(JD_[^']+)'", link_str)
+        hash_match = LINK_JD_HASH_PATTERN.search(link_str)
         if not hash_match:
             return None
             
@@ -722,13 +1826,13 @@ class SFCodeParser:
         # Categorize and format the reference
         if jd_ref.startswith('Article'):
             # Extract article number (Roman or Arabic)
-            article_match = re.match(r'Article([IVXLCDM]+|[\d\w-]+)', jd_ref)
+            article_match = ARTICLE_REF_PATTERN.match(jd_ref)
             if article_match:
                 return f"Article {article_match.group(1)}"
-        elif re.match(r'^A\d', jd_ref):
+        elif APPENDIX_SECTION_REF_PATTERN.match(jd_ref):
             # Appendix section reference (e.g., A8.343)
             return f"Section {jd_ref}"
-        elif re.match(r'^\d', jd_ref):
+        elif SECTION_REF_PATTERN.match(jd_ref):
             # Regular section reference
             return f"Section {jd_ref}"
         elif jd_ref.startswith('Appendix'):
@@ -746,32 +1850,27 @@ class SFCodeParser:
             'see_also': []
         }
         
-        history_divs = element.find_all('div', class_='History')
-        for history_div in history_divs:
-            history_text = history_div.get_text(strip=True)
-            
-            # Extract "Added by" ordinances
-            added_match = re.search(r'Added by\s+(.*?)(?:;|$)', history_text, re.IGNORECASE)
-            if added_match:
-                added_text = added_match.group(1)
-                # Find ordinance numbers in this text
-                ord_matches = re.findall(r'Ord\.?\s*([^;\s,)]+)', added_text)
-                history_data['added_by'].extend(ord_matches)
-            
-            # Extract "Amended by" ordinances  
-            amended_match = re.search(r'Amended by\s+(.*?)(?:;|$)', history_text, re.IGNORECASE)
-            if amended_match:
-                amended_text = amended_match.group(1)
-                # Find ordinance numbers in this text
-                ord_matches = re.findall(r'Ord\.?\s*([^;\s,)]+)', amended_text)
-                history_data['amended_by'].extend(ord_matches)
-            
-            # Extract "see" references
-            see_matches = re.findall(r'see\s+([^;)]+)', history_text, re.IGNORECASE)
-            history_data['see_also'].extend(see_matches)
+        for history_div in element.find_all('div', class_='History'):
+            self._add_history(history_div.get_text(strip=True), history_data)
         
         return history_data
     
+    def _add_history(self, history_text, history_data):
+        """Add the ordinances and references in one History div's text to history_data."""
+        # Extract "Added by" ordinances
+        added_match = HISTORY_ADDED_PATTERN.search(history_text)
+        if added_match:
+            # Find ordinance numbers in this text
+            history_data['added_by'].extend(ORDINANCE_PATTERN.findall(added_match.group(1)))
+        
+        # Extract "Amended by" ordinances
+        amended_match = HISTORY_AMENDED_PATTERN.search(history_text)
+        if amended_match:
+            history_data['amended_by'].extend(ORDINANCE_PATTERN.findall(amended_match.group(1)))
+        
+        # Extract "see" references
+        history_data['see_also'].extend(HISTORY_SEE_PATTERN.findall(history_text))
+    
     def div_links_extract_all(self, element):
         """Extract all types of links from an element."""
         # Internal links (Jump links within SF Municipal Code)
@@ -823,9 +1922,12 @@ class SFCodeParser:
             'image_links': image_links
         }
     
-    def _save_chunk(self, text: str, metadata: Dict[str, Any], static_metadata: Dict[str, str]):
-        """Save a chunk with its metadata in the standard document format."""
-        import time
+    def _save_chunk(self, text: str, metadata: Dict[str, Any], static_metadata: Dict[str, str], overlap=None):
+        """Save a chunk with its metadata in the standard document format.
+        
+        overlap, when given, is the [start, end] range of the previous chunk's content
+        that this chunk repeats; it is stored as a reference, not copied into content.
+        """
         # Create hierarchical title
         title_parts = []
         if metadata['chapter']:
@@ -849,7 +1951,7 @@ class SFCodeParser:
         doc_id = "_".join(doc_id_parts)
         
         # Generate deterministic UUID
-        doc_uuid = generate_doc_uuid(doc_id)
+        doc_uuid = self.doc_uuid(doc_id)
         
         # Remove the topic logic for now
         
@@ -870,14 +1972,73 @@ class SFCodeParser:
             'processing_timestamp': datetime.now(timezone.utc).isoformat(),
             'character_count': len(text)
         }
-        self.chunks.append(chunk)
+        if overlap:
+            chunk['overlap'] = overlap
+        if self.reference_table is not None:
+            chunk['reference_ids'] = chunk.pop('references')
+        if self.incremental_dir:
+            self._track_chunk(chunk)
+        with self.timer.stage('serialize'):
+            for writer in self.chunk_writers:
+                writer.write(chunk)
+        if self.keep_chunks:
+            self.chunks.append(chunk)
         self.chunk_number += 1
     
     
     def save_to_json(self, output_file: str):
-        """Save chunks to JSON file."""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.chunks, f, indent=2, ensure_ascii=False)
+        """Save chunks to JSON file, with its sidecar offset index."""
+        with self.timer.stage('serialize'):
+            with JsonArrayChunkWriter(output_file) as writer:
+                for chunk in self.chunks:
+                    writer.write(chunk)
+    
+    def print_stage_report(self):
+        """Print time, calls and peak memory per stage, slowest first."""
+        stages = self.stats['stages']
+        total = sum(stage['seconds'] for stage in stages.values())
+        print(f"\nStage timings ({total:.2f}s instrumented):")
+        print(f"  {'Stage':<15} {'Seconds':>9} {'Share':>6} {'Calls':>9} {'Peak memory':>12}")
+        for name, stage in sorted(stages.items(), key=lambda item: item[1]['seconds'], reverse=True):
+            share = stage['seconds'] / total if total else 0
+            peak = stage['peak_memory_bytes']
+            peak_text = f"{peak / (1024 * 1024):.1f} MB" if peak is not None else '-'
+            print(f"  {name:<15} {stage['seconds']:>9.3f} {share:>6.1%} {stage['calls']:>9} {peak_text:>12}")
+
+def parse_partition(task) -> List[ElementRecord]:
+    """Worker entry point: extract every rbox/footnote element from one HTML partition."""
+    html, line_offset, backend = task
+    # Workers never size or save chunks
+    parser = SFCodeParser(None, backend=backend, length_function=len, doc_uuid_function=builtin_doc_uuid)
+    soup = BeautifulSoup(html, backend)
+    return [parser._extract_element_record(element, line_offset)
+            for element in soup.find_all(has_target_class)]
+
+def browse_chunks(chunks):
+    """Page through chunks 10 at a time."""
+    print(f"\nBrowsing {len(chunks)} chunks (10 at a time, press Enter to continue):")
+    
+    for i in range(0, len(chunks), 10):
+        batch = chunks[i:i+10]
+        print(f"\n{'='*80}")
+        print(f"CHUNKS {i+1}-{min(i+10, len(chunks))} of {len(chunks)}")
+        print('='*80)
+        
+        for j, chunk in enumerate(batch):
+            chunk_num = i + j + 1
+            chapter = str(chunk.get('chapter', 'None'))[:30]
+            article = str(chunk.get('article', 'None'))[:30]
+            division = str(chunk.get('division', 'None'))[:30]
+            section_id = str(chunk.get('section_id', 'None'))[:20]
+            char_count = chunk.get('character_count', 0)
+            
+            print(f"**** [{chunk_num:3}] Ch:{chapter} | Art:{article} | Div:{division} | Sec:{section_id} | Chars:{char_count}")
+            print(f"CONTENT:")
+            print(chunk.get('content', ''))
+            print()
+        
+        if i + 10 < len(chunks):
+            input("Press Enter to continue to next 10 chunks...")
 
 def main():
     # Parse command-line arguments
@@ -886,44 +2047,134 @@ def main():
                             help=f"Input HTML file (default: {CONFIG['input_file']})")
     parser_args.add_argument('-o', '--output', required=True,
                             help="Output JSON file (required)")
+    parser_args.add_argument('-f', '--format', choices=['json', 'jsonl'],
+                            help="Output format: indented JSON array, or one chunk per line written as parsed "
+                                 "(default: jsonl for .jsonl/.ndjson outputs, json otherwise)")
+    parser_args.add_argument('--columnar', metavar='DIR',
+                            help="Also write a columnar chunk store to DIR (fast filtering in analyze_chunks.py)")
     parser_args.add_argument('-s', '--chunk-size', type=int, default=CONFIG['max_chunk_size'],
-                            help=f"Maximum chunk size (default: {CONFIG['max_chunk_size']})")
+                            help=f"Maximum chunk size, in units of --length (default: {CONFIG['max_chunk_size']})")
+    parser_args.add_argument('--overlap', type=int, default=CONFIG['chunk_overlap'], metavar='N',
+                            help="Start each chunk split for size with about N characters of the previous chunk, "
+                                 "stored as an 'overlap' offset range into it (default: %(default)s)")
+    parser_args.add_argument('--length', default=CONFIG['length_function'], metavar='FUNCTION',
+                            help="How chunk size is measured: chars, words, tiktoken:ENCODING (e.g. "
+                                 f"tiktoken:cl100k_base) or MODULE:FUNCTION (default: {CONFIG['length_function']})")
+    parser_args.add_argument('--xref', metavar='DIR',
+                            help="Also write a cross-reference graph to DIR: section -> defining chunks and "
+                                 "cited/citing sections as CSR arrays (see xref_graph.py)")
+    parser_args.add_argument('--text-index', metavar='DIR',
+                            help="Also write a full-text phrase index of chunk content to DIR: varint-encoded "
+                                 "postings with token positions (search it with text_index.py)")
+    parser_args.add_argument('--reference-table', metavar='FILE',
+                            help="Write each distinct internal-link reference once to FILE (JSON array) and "
+                                 "give chunks 'reference_ids' into it instead of full 'references' dicts")
+    parser_args.add_argument('--profile', metavar='FILE',
+                            help="Write a cProfile dump of parsing and saving to FILE "
+                                 "(pstats format: snakeviz, or flameprof for a flame graph)")
+    parser_args.add_argument('--trace-memory', action='store_true',
+                            help="Also record peak memory per stage with tracemalloc (slower)")
+    parser_args.add_argument('--progress', choices=PROGRESS_MODES, default='text',
+                            help="Progress reports while parsing: text lines on stdout, JSON lines on stderr "
+                                 "(for orchestrators), or quiet (default: text)")
+    parser_args.add_argument('--progress-interval', type=float, default=CONFIG['progress_interval'], metavar='SECONDS',
+                            help=f"Seconds between progress reports (default: {CONFIG['progress_interval']})")
     parser_args.add_argument('-b', '--browse', action='store_true',
                             help="Browse chunks interactively after parsing")
+    mode_args = parser_args.add_mutually_exclusive_group()
+    mode_args.add_argument('--stream', action='store_true',
+                            help="Process each rbox/footnote element as soon as it closes instead of building the full tree")
+    mode_args.add_argument('--workers', type=int, default=1, metavar='N',
+                            help="Extract elements in N worker processes, partitioned at top-level Chapters (default: 1)")
+    parser_args.add_argument('--incremental', metavar='DIR',
+                            help="Reparse only top-level blocks changed since the previous run using DIR "
+                                 "(block cache and manifest), and report added/removed/changed chunk_ids")
+    parser_args.add_argument('--backend', default=CONFIG['backend'], choices=['html.parser', 'lxml'],
+                            help=f"BeautifulSoup tree builder (default: {CONFIG['backend']})")
+    parser_args.add_argument('--doc-uuid', default=CONFIG['doc_uuid'], choices=DOC_UUID_SOURCES,
+                            help="Chunk uuids from the congressionalrag helpers, or a built-in uuid5 of the doc_id "
+                                 f"not yet confirmed to match them (default: {CONFIG['doc_uuid']})")
+    parser_args.add_argument('--congressionalrag-path', default=CONFIG['congressionalrag_path'], metavar='DIR',
+                            help="congressionalrag checkout providing helpers.helpers.generate_doc_uuid "
+                                 "(default: $CONGRESSIONALRAG_PATH)")
     args = parser_args.parse_args()
+    if args.incremental and args.stream:
+        parser_args.error("--incremental cannot be combined with --stream")
     
     # Parse the file
     print(f"Parsing {args.input}...")
-    parser = SFCodeParser(args.input, max_chunk_size=args.chunk_size)
-    chunks = parser.parse()
+    try:
+        length_function = make_length_function(args.length)
+    except (ImportError, ValueError, AttributeError) as e:
+        parser_args.error(f"--length {args.length}: {e}")
+    if builder_registry.lookup(args.backend) is None:
+        parser_args.error(f"--backend {args.backend}: the {args.backend} package is not installed")
+    try:
+        doc_uuid_function = make_doc_uuid_function(args.doc_uuid, args.congressionalrag_path)
+    except ImportError as e:
+        parser_args.error(f"--doc-uuid {args.doc_uuid}: {e}")
+    parser = SFCodeParser(args.input, max_chunk_size=args.chunk_size, streaming=args.stream,
+                          backend=args.backend, workers=args.workers, incremental_dir=args.incremental,
+                          length_function=length_function, overlap=args.overlap,
+                          reference_table=bool(args.reference_table), trace_memory=args.trace_memory,
+                          progress=args.progress, progress_interval=args.progress_interval,
+                          doc_uuid_function=doc_uuid_function)
+    output_format = args.format or format_for_path(args.output)
+    columnar_writer = ColumnarChunkWriter(args.columnar) if args.columnar else None
+    if columnar_writer:
+        parser.chunk_writers.append(columnar_writer)
+    xref_writer = XrefGraphWriter(args.xref, parser.reference_table) if args.xref else None
+    if xref_writer:
+        parser.chunk_writers.append(xref_writer)
+    text_index_writer = TextIndexWriter(args.text_index) if args.text_index else None
+    if text_index_writer:
+        parser.chunk_writers.append(text_index_writer)
     
-    if args.browse:
-        print(f"\nBrowsing {len(chunks)} chunks (10 at a time, press Enter to continue):")
-        
-        for i in range(0, len(chunks), 10):
-            batch = chunks[i:i+10]
-            print(f"\n{'='*80}")
-            print(f"CHUNKS {i+1}-{min(i+10, len(chunks))} of {len(chunks)}")
-            print('='*80)
-            
-            for j, chunk in enumerate(batch):
-                chunk_num = i + j + 1
-                chapter = str(chunk.get('chapter', 'None'))[:30]
-                article = str(chunk.get('article', 'None'))[:30]
-                division = str(chunk.get('division', 'None'))[:30]
-                section_id = str(chunk.get('section_id', 'None'))[:20]
-                char_count = chunk.get('character_count', 0)
-                
-                print(f"**** [{chunk_num:3}] Ch:{chapter} | Art:{article} | Div:{division} | Sec:{section_id} | Chars:{char_count}")
-                print(f"CONTENT:")
-                print(chunk.get('content', ''))
-                print()
-            
-            if i + 10 < len(chunks):
-                input("Press Enter to continue to next 10 chunks...")
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
     
-    parser.save_to_json(args.output)
-    print(f"Saved {len(chunks)} chunks to {args.output}")
+    if output_format == 'jsonl':
+        # Write each chunk as it is produced so the full list never lives in memory
+        with JsonlChunkWriter(args.output) as writer:
+            parser.chunk_writers.append(writer)
+            parser.keep_chunks = False
+            parser.parse()
+    else:
+        parser.parse()
+        parser.save_to_json(args.output)
+    with parser.timer.stage('serialize'):
+        if columnar_writer:
+            columnar_writer.close()
+        if xref_writer:
+            xref_manifest = xref_writer.close()
+        if text_index_writer:
+            text_index_manifest = text_index_writer.close()
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    
+    print(f"Saved {parser.chunk_number - 1} chunks to {args.output}")
+    if args.reference_table:
+        parser.save_reference_table(args.reference_table)
+        print(f"Saved {len(parser.reference_table)} references to {args.reference_table}")
+    if columnar_writer:
+        print(f"Saved columnar chunk store to {args.columnar}")
+    if xref_writer:
+        print(f"Saved cross-reference graph ({xref_manifest['nodes']} nodes, "
+              f"{xref_manifest['edges']} edges) to {args.xref}")
+    if text_index_writer:
+        print(f"Saved full-text index ({text_index_manifest['terms']} terms, "
+              f"{text_index_manifest['tokens']} tokens) to {args.text_index}")
+    
+    parser.print_stage_report()
+    if args.profile:
+        print(f"Saved profile to {args.profile}")
+    
+    if args.browse:
+        browse_chunks(parser.chunks if parser.keep_chunks else load_chunks(args.output))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Incremental mode: an edit reports only the chunks of the edited section as changed.
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+
+from generate_html import write_html
+from parse_sf_code import SFCodeParser, builtin_doc_uuid
+
+EDITED_SECTION = '1.100'  # First section of the generated document
+
+
+class IncrementalChangesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.previous_dir = os.getcwd()
+        os.chdir(self.work_dir)  # The parser writes unhandled_text.json to the working directory
+        self.html_path = os.path.join(self.work_dir, 'input.html')
+        with open(self.html_path, 'w', encoding='utf-8') as f:
+            write_html(f, 200 * 1024, seed=7)
+
+    def tearDown(self):
+        os.chdir(self.previous_dir)
+        shutil.rmtree(self.work_dir)
+
+    def parse(self):
+        parser = SFCodeParser(self.html_path, incremental_dir=os.path.join(self.work_dir, 'cache'),
+                              doc_uuid_function=builtin_doc_uuid)
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = parser.parse()
+        return parser, chunks
+
+    def test_inserted_line_changes_only_its_section(self):
+        _, first_chunks = self.parse()
+        timestamps = {chunk['chunk_id']: chunk['processing_timestamp'] for chunk in first_chunks}
+
+        with open(self.html_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        anchor = f'<a name="JD_{EDITED_SECTION}"></a>'
+        section_end = html.index('</div></div>\n', html.index(anchor)) + len('</div></div>\n')
+        inserted = '<div class="rbox Normal-Level"><div class="Normal">An inserted paragraph.</div></div>\n'
+        with open(self.html_path, 'w', encoding='utf-8') as f:
+            f.write(html[:section_end] + inserted + html[section_end:])
+
+        parser, chunks = self.parse()
+        changes = parser.chunk_changes
+        touched = changes['added'] + changes['removed'] + changes['changed']
+        self.assertTrue(touched, changes)
+        for key in touched:
+            self.assertIn(f'_{EDITED_SECTION}_', key)
+        self.assertLess(len(touched), len(chunks) // 10)
+
+        # Unchanged chunks keep their processing_timestamp
+        for chunk in chunks:
+            if chunk['chunk_id'] not in touched and chunk['chunk_id'] in timestamps:
+                self.assertEqual(chunk['processing_timestamp'], timestamps[chunk['chunk_id']])
+
+        with open(os.path.join(self.work_dir, 'cache', 'changes.json'), 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f), changes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Overlapping chunks: a size split within a section starts with the end of the previous
+chunk, stored as an overlap range that resolves to text within max_chunk_size.
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from chunk_store import OVERLAP_SEPARATOR, iter_resolved_content, resolve_content
+from parse_sf_code import SFCodeParser, builtin_doc_uuid
+
+FIXTURE = os.path.join(REPO_DIR, 'tests', 'fixtures', 'sample_code.html')
+MAX_CHUNK_SIZE = 400
+OVERLAP = 80
+
+
+class OverlapTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        work_dir = tempfile.mkdtemp()
+        previous_dir = os.getcwd()
+        os.chdir(work_dir)  # The parser writes unhandled_text.json to the working directory
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                cls.chunks = SFCodeParser(FIXTURE, max_chunk_size=MAX_CHUNK_SIZE, overlap=OVERLAP,
+                                          doc_uuid_function=builtin_doc_uuid).parse()
+                cls.plain_chunks = SFCodeParser(FIXTURE, max_chunk_size=MAX_CHUNK_SIZE,
+                                                doc_uuid_function=builtin_doc_uuid).parse()
+        finally:
+            os.chdir(previous_dir)
+            shutil.rmtree(work_dir)
+
+    def test_overlap_resolves_to_previous_tail(self):
+        overlapped = 0
+        for i, chunk in enumerate(self.chunks):
+            if not chunk.get('overlap'):
+                continue
+            overlapped += 1
+            start, end = chunk['overlap']
+            previous = self.chunks[i - 1]['content']
+            self.assertEqual(end, len(previous))
+            self.assertLessEqual(len(previous) - start, OVERLAP)
+            self.assertFalse(previous[start].isspace())
+            self.assertEqual(resolve_content(self.chunks, i), previous[start:end] + OVERLAP_SEPARATOR + chunk['content'])
+            self.assertLessEqual(len(resolve_content(self.chunks, i)), MAX_CHUNK_SIZE)
+        self.assertTrue(overlapped)
+
+        resolved = [content for _, content in iter_resolved_content(self.chunks)]
+        self.assertEqual(resolved, [resolve_content(self.chunks, i) for i in range(len(self.chunks))])
+
+    def test_overlap_stays_within_section(self):
+        crossings = 0
+        for previous, chunk in zip(self.chunks, self.chunks[1:]):
+            if chunk.get('overlap'):
+                self.assertEqual(chunk['doc_id'], previous['doc_id'])
+            elif chunk['doc_id'] != previous['doc_id'] and chunk['hash'] == previous['hash']:
+                # Size split where the next paragraph has its own id: a new doc_id, no overlap
+                crossings += 1
+        self.assertTrue(crossings)
+
+    def test_no_overlap_by_default(self):
+        self.assertFalse(any(chunk.get('overlap') for chunk in self.plain_chunks))
+        resolved = [content for _, content in iter_resolved_content(self.plain_chunks)]
+        self.assertEqual(resolved, [chunk['content'] for chunk in self.plain_chunks])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Parse modes: streaming and multi-process output match the full-tree parse chunk for chunk.
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from parse_sf_code import SFCodeParser, builtin_doc_uuid, partition_html
+
+# Nested rboxes, footnote tables and a wrapper div around the Chapters
+FIXTURE = os.path.join(REPO_DIR, 'tests', 'fixtures', 'sample_code.html')
+MAX_CHUNK_SIZE = 400
+
+
+class ParseModesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.previous_dir = os.getcwd()
+        os.chdir(self.work_dir)  # The parser writes unhandled_text.json to the working directory
+
+    def tearDown(self):
+        os.chdir(self.previous_dir)
+        shutil.rmtree(self.work_dir)
+
+    def parse(self, **options):
+        parser = SFCodeParser(FIXTURE, max_chunk_size=MAX_CHUNK_SIZE, doc_uuid_function=builtin_doc_uuid, **options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = parser.parse()
+        for chunk in chunks:
+            del chunk['processing_timestamp']
+        return chunks
+
+    def assertSameChunks(self, chunks, baseline):
+        self.assertEqual(len(chunks), len(baseline))
+        for chunk, expected in zip(chunks, baseline):
+            self.assertEqual(chunk, expected)
+
+    def test_streaming_matches_full_parse(self):
+        baseline = self.parse()
+        self.assertTrue(any('[Footnote ' in chunk['content'] for chunk in baseline))
+        self.assertSameChunks(self.parse(streaming=True), baseline)
+
+    def test_workers_match_full_parse(self):
+        with open(FIXTURE, 'r', encoding='utf-8') as f:
+            self.assertGreater(len(partition_html(f.read(), 3)), 1)  # Both Chapters are top-level
+        self.assertSameChunks(self.parse(workers=3), self.parse())
+
+
+if __name__ == '__main__':
+    unittest.main()
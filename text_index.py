@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Full-text phrase index over chunk content, built while chunks are written.
+
+Content is split into lowercased word tokens (runs of letters and digits, so
+"SEC. 41A" is 'sec', '41a' and "short-term" is 'short', 'term'). The index
+directory holds:
+- terms.bin / terms.off:       the sorted terms as one UTF-8 blob with int64 offsets
+- postings.bin / postings.off: one posting list per term, with int64 offsets
+
+A posting list is made of varints: a header (the number of chunks containing the term
+and the byte sizes of the next two sections), the chunk_numbers delta-encoded, the
+byte length of each chunk's positions block, then the blocks themselves (that chunk's
+delta-encoded token positions). Looking up
+a term is a binary search over the mapped terms; a phrase query decodes the rarest
+term's chunks first and only decodes positions for chunks every term appears in, so
+it never reads chunk content. Snippets read just the matching chunks' content
+through the chunk file's offset index.
+"""
+
+import json
+import os
+import re
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+from chunk_store import map_file, remove_manifest, write_manifest_atomically
+
+TEXT_INDEX_FORMAT = 'sf-text-index'
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+SNIPPET_CONTEXT = 60  # Characters of content shown on each side of a match
+LEADING_PARTIAL_WORD_PATTERN = re.compile(r'^\S*')
+TRAILING_PARTIAL_WORD_PATTERN = re.compile(r'\S*$')
+
+
+def tokenize(text):
+    """Lowercased word tokens of text, in order."""
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def encode_varint(value, out):
+    """Append value to bytearray out as a little-endian base-128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    """Decode one varint from data at offset; return (value, next offset)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def decode_varints(data, start, end):
+    """Decode every varint in data[start:end]."""
+    run = data[start:end]
+    if not run or max(run) < 0x80:
+        # Deltas are mostly small: a run of one-byte varints is just its bytes
+        return list(run)
+    values = []
+    offset = 0
+    while offset < len(run):
+        value, offset = decode_varint(run, offset)
+        values.append(value)
+    return values
+
+
+class TextIndexWriter:
+    """Collect token positions from chunks as they are produced.
+
+    Used as one of SFCodeParser.chunk_writers; chunks must arrive in increasing
+    chunk_number order, as the parser writes them. The index is written on close().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # term -> [chunk_number deltas, positions block lengths, positions blocks, last chunk_number, chunk count]
+        self.postings = {}
+        self.chunks = 0
+        self.tokens = 0
+
+    def write(self, chunk):
+        chunk_number = chunk['chunk_number']
+        positions = {}
+        tokens = tokenize(chunk.get('content') or '')
+        for position, token in enumerate(tokens):
+            token_positions = positions.get(token)
+            if token_positions is None:
+                positions[token] = [position]
+            else:
+                token_positions.append(position)
+        self.chunks += 1
+        self.tokens += len(tokens)
+
+        for term, term_positions in positions.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = [bytearray(), bytearray(), bytearray(), 0, 0]
+            elif chunk_number <= entry[3]:
+                raise ValueError(f"Chunk {chunk_number} written after chunk {entry[3]}; "
+                                 f"chunks must be indexed in chunk_number order")
+            encode_varint(chunk_number - entry[3], entry[0])
+            block = entry[2]
+            block_start = len(block)
+            previous = 0
+            for position in term_positions:
+                encode_varint(position - previous, block)
+                previous = position
+            encode_varint(len(block) - block_start, entry[1])
+            entry[3] = chunk_number
+            entry[4] += 1
+
+    def close(self):
+        os.makedirs(self.directory, exist_ok=True)
+        remove_manifest(self.directory)
+        terms = sorted(self.postings)
+        term_offsets = array('q', [0])
+        posting_offsets = array('q', [0])
+        with open(os.path.join(self.directory, 'terms.bin'), 'wb') as terms_file, \
+                open(os.path.join(self.directory, 'postings.bin'), 'wb') as postings_file:
+            for term in terms:
+                encoded = term.encode('utf-8')
+                terms_file.write(encoded)
+                term_offsets.append(term_offsets[-1] + len(encoded))
+                chunk_deltas, block_lengths, blocks, _, count = self.postings[term]
+                header = bytearray()
+                encode_varint(count, header)
+                encode_varint(len(chunk_deltas), header)
+                encode_varint(len(block_lengths), header)
+                for part in (header, chunk_deltas, block_lengths, blocks):
+                    postings_file.write(part)
+                posting_offsets.append(posting_offsets[-1] + len(header) + len(chunk_deltas)
+                                       + len(block_lengths) + len(blocks))
+        with open(os.path.join(self.directory, 'terms.off'), 'wb') as f:
+            term_offsets.tofile(f)
+        with open(os.path.join(self.directory, 'postings.off'), 'wb') as f:
+            posting_offsets.tofile(f)
+
+        manifest = {
+            'format': TEXT_INDEX_FORMAT,
+            'version': 1,
+            'terms': len(terms),
+            'chunks': self.chunks,
+            'tokens': self.tokens,
+            'token_pattern': TOKEN_PATTERN.pattern
+        }
+        write_manifest_atomically(self.directory, manifest)
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TermPostings:
+    """Decoded chunk list of one term; positions are decoded per chunk on request."""
+
+    __slots__ = ('chunk_numbers', 'blocks_start', 'block_ends', 'data')
+
+    def __init__(self, data):
+        self.data = data
+        _, offset = decode_varint(data, 0)
+        deltas_size, offset = decode_varint(data, offset)
+        lengths_size, offset = decode_varint(data, offset)
+        lengths_start = offset + deltas_size
+        self.blocks_start = lengths_start + lengths_size
+        self.chunk_numbers = list(accumulate(decode_varints(data, offset, lengths_start)))
+        self.block_ends = [self.blocks_start + end
+                           for end in accumulate(decode_varints(data, lengths_start, self.blocks_start))]
+
+    def __len__(self):
+        return len(self.chunk_numbers)
+
+    def positions(self, chunk_number):
+        """Token positions of the term in chunk_number (empty if it does not occur there)."""
+        i = bisect_left(self.chunk_numbers, chunk_number)
+        if i == len(self.chunk_numbers) or self.chunk_numbers[i] != chunk_number:
+            return []
+        start = self.block_ends[i - 1] if i else self.blocks_start
+        return list(accumulate(decode_varints(self.data, start, self.block_ends[i])))
+
+
+class TextIndex:
+    """Read a full-text index directory written by TextIndexWriter."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != TEXT_INDEX_FORMAT:
+            raise ValueError(f"{directory} is not a full-text index")
+        self._terms = map_file(os.path.join(directory, 'terms.bin'))
+        self._term_offsets = memoryview(map_file(os.path.join(directory, 'terms.off'))).cast('q')
+        self._postings = map_file(os.path.join(directory, 'postings.bin'))
+        self._posting_offsets = memoryview(map_file(os.path.join(directory, 'postings.off'))).cast('q')
+
+    def __len__(self):
+        return self.manifest['terms']
+
+    def _term_id(self, term):
+        """Position of term in the sorted terms (compared as UTF-8 bytes), or None."""
+        encoded = term.encode('utf-8')
+        offsets = self._term_offsets
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._terms[offsets[middle]:offsets[middle + 1]] < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._terms[offsets[low]:offsets[low + 1]] == encoded:
+            return low
+        return None
+
+    def postings(self, term):
+        """TermPostings of a (lowercased) term, or None if no chunk contains it."""
+        term_id = self._term_id(term)
+        if term_id is None:
+            return None
+        offsets = self._posting_offsets
+        return TermPostings(bytes(self._postings[offsets[term_id]:offsets[term_id + 1]]))
+
+    def search(self, query, limit=None):
+        """Find the chunks containing query as a phrase.
+
+        Returns [(chunk_number, token positions where the phrase starts)] in
+        chunk_number order, at most limit entries if given.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        term_postings = {}
+        for term in tokens:
+            if term not in term_postings:
+                postings = self.postings(term)
+                if postings is None:
+                    return []
+                term_postings[term] = postings
+
+        # Intersect chunk lists, smallest first, before any positions are decoded
+        by_size = sorted(term_postings.values(), key=len)
+        candidates = by_size[0].chunk_numbers
+        for postings in by_size[1:]:
+            chunk_numbers = set(postings.chunk_numbers)
+            candidates = [chunk_number for chunk_number in candidates if chunk_number in chunk_numbers]
+
+        hits = []
+        for chunk_number in candidates:
+            starts = term_postings[tokens[0]].positions(chunk_number)
+            for i, term in enumerate(tokens[1:], 1):
+                positions = set(term_postings[term].positions(chunk_number))
+                starts = [start for start in starts if start + i in positions]
+                if not starts:
+                    break
+            if starts:
+                hits.append((chunk_number, starts))
+                if limit is not None and len(hits) >= limit:
+                    break
+        return hits
+
+
+def make_snippet(content, start, length, context=SNIPPET_CONTEXT):
+    """Content around the length-token phrase starting at token start, with the phrase in **bold**."""
+    spans = [match.span() for match in TOKEN_PATTERN.finditer(content)]
+    match_start, match_end = spans[start][0], spans[start + length - 1][1]
+    before = max(0, match_start - context)
+    after = min(len(content), match_end + context)
+    head, tail = content[before:match_start], content[match_end:after]
+    # Drop words cut off at either end
+    if before and not content[before - 1].isspace():
+        head = LEADING_PARTIAL_WORD_PATTERN.sub('', head, count=1)
+    if after < len(content) and not content[after].isspace():
+        tail = TRAILING_PARTIAL_WORD_PATTERN.sub('', tail, count=1)
+    snippet = ' '.join((head + '**' + content[match_start:match_end] + '**' + tail).split())
+    return ('...' if before else '') + snippet + ('...' if after < len(content) else '')
+
+
+def hit_snippets(chunks, query, hits, context=SNIPPET_CONTEXT):
+    """Return [(chunk_number, snippets)] for TextIndex.search hits, reading content of the hits only.
+
+    chunks is an open chunk file or columnar store (chunk_store.open_chunks).
+    """
+    length = len(tokenize(query))
+    results = []
+    for chunk_number, starts in hits:
+        position = chunks.position(chunk_number)
+        if position is None:
+            results.append((chunk_number, []))
+            continue
+        content = chunks[position]['content']
+        results.append((chunk_number, [make_snippet(content, start, length, context) for start in starts]))
+    return results
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Search a full-text index of chunk content by phrase')
+    parser.add_argument('index', help='Index directory (parse_sf_code.py --text-index)')
+    parser.add_argument('queries', nargs='+', metavar='PHRASE', help='Phrases to search for, e.g. "SEC. 41A"')
+    parser.add_argument('-c', '--chunks', metavar='FILE',
+                        help='Chunk file or columnar store the index was built with, to show snippets')
+    parser.add_argument('-n', '--limit', type=int, default=20, help='Maximum chunks per phrase (default: 20)')
+    parser.add_argument('--all', action='store_true', help='Show every matching chunk')
+    args = parser.parse_args()
+
+    index = TextIndex(args.index)
+    limit = None if args.all else args.limit
+    chunks = None
+    if args.chunks:
+        from chunk_store import open_chunks
+        chunks = open_chunks(args.chunks)
+
+    for query in args.queries:
+        start = time.perf_counter()
+        hits = index.search(query, limit)
+        milliseconds = (time.perf_counter() - start) * 1000
+        more = ' (limit reached, use --all for every match)' if limit is not None and len(hits) == limit else ''
+        print(f"=== {query}: {len(hits)} chunks in {milliseconds:.1f} ms{more} ===")
+        if chunks is None:
+            for chunk_number, starts in hits:
+                print(f"Chunk {chunk_number}: {len(starts)} matches")
+            continue
+        for chunk_number, snippets in hit_snippets(chunks, query, hits):
+            print(f"Chunk {chunk_number}:")
+            for snippet in snippets or ['(chunk not in chunk file)']:
+                print(f"  {snippet}")
+
+
+if __name__ == "__main__":
+    main()
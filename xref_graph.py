@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Cross-reference graph of SF code sections, built while chunks are written.
+
+Nodes are section hashes ('#JD_1.00', as in a chunk's 'hash' and its references'
+'hash') plus intercode link destinations ('intercode:<destination_id>'). The graph
+directory holds three CSR (compressed sparse row) adjacency lists, each an int64
+offsets array (one row per node, plus one) and an int64 values array:
+- defines: node -> chunk_numbers of the chunks in that section
+- out:     node -> nodes its chunks reference (sections and intercode destinations)
+- in:      node -> sections whose chunks reference it
+
+Every lookup reads one offsets pair and a slice of values, so expanding a retrieval
+hit to the sections it cites, or that cite it, costs O(degree).
+"""
+
+import json
+import os
+from array import array
+
+from chunk_store import remove_manifest, resolve_references, write_manifest_atomically
+
+XREF_FORMAT = 'sf-xref-csr'
+ADJACENCY_LISTS = ('defines', 'out', 'in')
+INTERCODE_PREFIX = 'intercode:'
+
+
+def intercode_node(destination_id):
+    """Node key of an intercode link destination."""
+    return INTERCODE_PREFIX + destination_id
+
+
+class XrefGraphWriter:
+    """Collect section definitions and references from chunks as they are produced.
+
+    Used as one of SFCodeParser.chunk_writers; the CSR arrays are written on close().
+    reference_table is the parser's reference table when chunks carry reference_ids.
+    """
+
+    def __init__(self, directory, reference_table=None):
+        self.directory = directory
+        self.reference_table = reference_table
+        self.defines = {}  # section hash -> chunk_numbers
+        self.outbound = {}  # section hash -> set of referenced node keys
+
+    def write(self, chunk):
+        section = chunk.get('hash')
+        if not section:
+            return
+        self.defines.setdefault(section, []).append(chunk['chunk_number'])
+        targets = self.outbound.setdefault(section, set())
+        for reference in resolve_references(chunk, self.reference_table):
+            if reference['hash'] != section:
+                targets.add(reference['hash'])
+        for link in chunk.get('all_links', {}).get('intercode_links', []):
+            targets.add(intercode_node(link['destination_id']))
+
+    def close(self):
+        os.makedirs(self.directory, exist_ok=True)
+        remove_manifest(self.directory)
+        nodes = set(self.defines)
+        for targets in self.outbound.values():
+            nodes.update(targets)
+        nodes = sorted(nodes)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+
+        inbound = {}
+        for section, targets in self.outbound.items():
+            for target in targets:
+                inbound.setdefault(target, []).append(node_ids[section])
+
+        rows = {
+            'defines': lambda node: self.defines.get(node, []),
+            'out': lambda node: sorted(node_ids[target] for target in self.outbound.get(node, ())),
+            'in': lambda node: sorted(inbound.get(node, []))
+        }
+        edges = 0
+        for name, row in rows.items():
+            offsets = array('q', [0])
+            values = array('q')
+            for node in nodes:
+                values.extend(row(node))
+                offsets.append(len(values))
+            with open(os.path.join(self.directory, f'{name}.off'), 'wb') as f:
+                offsets.tofile(f)
+            with open(os.path.join(self.directory, f'{name}.i64'), 'wb') as f:
+                values.tofile(f)
+            if name == 'out':
+                edges = len(values)
+
+        with open(os.path.join(self.directory, 'nodes.json'), 'w', encoding='utf-8') as f:
+            json.dump(nodes, f, ensure_ascii=False)
+        manifest = {
+            'format': XREF_FORMAT,
+            'version': 1,
+            'nodes': len(nodes),
+            'edges': edges,
+            'adjacency_lists': list(ADJACENCY_LISTS)
+        }
+        write_manifest_atomically(self.directory, manifest)
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class XrefGraph:
+    """Read a cross-reference graph directory written by XrefGraphWriter."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != XREF_FORMAT:
+            raise ValueError(f"{directory} is not a cross-reference graph")
+        with open(os.path.join(directory, 'nodes.json'), 'r', encoding='utf-8') as f:
+            self.nodes = json.load(f)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self._offsets = {}
+        self._values = {}
+        for name in ADJACENCY_LISTS:
+            offsets = array('q')
+            with open(os.path.join(directory, f'{name}.off'), 'rb') as f:
+                offsets.fromfile(f, len(self.nodes) + 1)
+            values = array('q')
+            with open(os.path.join(directory, f'{name}.i64'), 'rb') as f:
+                values.fromfile(f, offsets[-1])
+            self._offsets[name] = offsets
+            self._values[name] = values
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.node_ids
+
+    def _row(self, name, node):
+        i = self.node_ids.get(node)
+        if i is None:
+            return []
+        offsets = self._offsets[name]
+        return self._values[name][offsets[i]:offsets[i + 1]].tolist()
+
+    def defining_chunks(self, section):
+        """chunk_numbers of the chunks in a section."""
+        return self._row('defines', section)
+
+    def cites(self, section):
+        """Nodes a section references: section hashes and 'intercode:<id>' destinations."""
+        return [self.nodes[i] for i in self._row('out', section)]
+
+    def cited_by(self, node):
+        """Sections that reference a section hash or intercode destination."""
+        return [self.nodes[i] for i in self._row('in', node)]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Look up sections in a cross-reference graph')
+    parser.add_argument('graph', help='Graph directory (parse_sf_code.py --xref)')
+    parser.add_argument('sections', nargs='+', metavar='HASH',
+                        help="Section hashes (e.g. '#JD_1.00') or intercode:<destination_id> nodes")
+    args = parser.parse_args()
+
+    graph = XrefGraph(args.graph)
+    for section in args.sections:
+        if section not in graph:
+            print(f"{section}: not in graph")
+            continue
+        print(f"=== {section} ===")
+        print(f"Chunks:   {graph.defining_chunks(section)}")
+        print(f"Cites:    {graph.cites(section)}")
+        print(f"Cited by: {graph.cited_by(section)}")
+
+
+if __name__ == "__main__":
+    main()